@@ -5,20 +5,26 @@ th_cnd_utils - AI-DO工具库
 一个包含各种数据存储和云服务工具的Python库。
 
 功能特性：
-- MySQL数据库操作工具
-- Redis缓存操作工具
-- RabbitMQ消息队列工具
+- MySQL数据库操作工具（含asyncio异步版本）
+- Redis缓存操作工具（含asyncio异步版本、进程内+Redis两级缓存装饰器、分布式锁与限流器）
+- RabbitMQ消息队列工具（含asyncio异步版本）
 - SQLite数据库操作工具
 - 阿里云表格存储(OTS)工具
 - 阿里云对象存储(OSS)工具
 - 李龙平台加密接口客户端
 - Web应用程序客户端
 - Flask工具类
+- 数据库/云服务操作耗时统计与慢操作日志
 """
 
 from .db.mysql import mysql_util
+from .db.async_mysql import AsyncMySQLUtil, async_mysql_util
 from .db.redis import redis_util
+from .db.async_redis import AsyncRedisUtil, async_redis_util
+from .db.tiered_cache import TieredCache, cached
+from .db.coordination import RedisLock, RateLimiter
 from .db.rabbitmq import rabbitmq_util
+from .db.async_rabbitmq import AsyncRabbitMQUtil, async_rabbitmq_util
 from .db.sqlite import sqlite_util
 from .cloud.ots import ots_util
 from .cloud.oss import oss_util
@@ -26,11 +32,22 @@ from .service_client import ServiceClient
 from .flask_util import FlaskUtil, flask_util
 from .web_app_client import WebAppClient, web_app_client
 from .config import config
+from .instrumentation import Instrumentation, instrumentation
 
 __all__ = [
     'mysql_util',
+    'AsyncMySQLUtil',
+    'async_mysql_util',
     'redis_util',
+    'AsyncRedisUtil',
+    'async_redis_util',
+    'TieredCache',
+    'cached',
+    'RedisLock',
+    'RateLimiter',
     'rabbitmq_util',
+    'AsyncRabbitMQUtil',
+    'async_rabbitmq_util',
     'sqlite_util',
     'ots_util',
     'oss_util',
@@ -39,7 +56,9 @@ __all__ = [
     'flask_util',
     'WebAppClient',
     'web_app_client',
-    'config'
+    'config',
+    'Instrumentation',
+    'instrumentation'
 ]
 
 __version__ = "1.0.0"
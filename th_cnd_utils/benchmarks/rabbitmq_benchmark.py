@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+RabbitMQUtil 吞吐量基准测试
+在本地 RabbitMQ 上按消息大小、prefetch、持久化、发布确认和消费确认方式的组合，
+测量 rabbitmq_util 的发送/消费速率（msgs/sec）和端到端延迟（p50/p99），结果写入 JSON 文件
+
+用法：
+    python th_cnd_utils/benchmarks/rabbitmq_benchmark.py --count 10000 --sizes 128,4096 \
+        --prefetch 10,200 --ack-modes auto,batch --output rabbitmq_benchmark.json
+
+连接参数使用 RABBITMQ_HOST/RABBITMQ_PORT 等环境变量，测试队列在结束后删除
+"""
+
+import sys
+import os
+import json
+import time
+import queue
+import struct
+import argparse
+import itertools
+import contextlib
+import multiprocessing
+from datetime import datetime
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import pika
+from th_cnd_utils import rabbitmq_util
+
+# 消息头部：发送时间戳（time.time()），用于计算端到端延迟
+_HEADER = struct.Struct('!d')
+
+ACK_MODES = ('auto', 'manual', 'batch')
+PUBLISH_MODES = ('plain', 'confirm')
+PERSISTENCE = ('persistent', 'transient')
+
+
+@contextlib.contextmanager
+def _quiet():
+    """屏蔽工具类逐批/逐条打印的日志，避免输出影响测量结果"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def _percentile(sorted_values, percent):
+    """最近秩法计算百分位数"""
+    if not sorted_values:
+        return None
+    index = max(int(len(sorted_values) * percent / 100 + 0.5) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def _consume_worker(queue_name, count, prefetch, ack_mode, compression, ready, results):
+    """
+    消费进程：接收 count 条消息后停止，把延迟和接收时间放入 results
+    消费者使用独立进程和独立连接，发送和消费同时进行
+    """
+    rabbitmq_util.compression = compression
+    latencies = []
+    times = []
+    
+    def record(body):
+        now = time.time()
+        latencies.append(now - _HEADER.unpack_from(body)[0])
+        times.append(now)
+    
+    def on_message(message_info):
+        record(message_info['body'])
+        if ack_mode == 'manual':
+            rabbitmq_util.manual_ack(message_info['channel'], message_info['method'].delivery_tag)
+        if len(latencies) >= count:
+            rabbitmq_util.stop_consuming()
+    
+    def on_batch(messages):
+        for message in messages:
+            record(message['body'])
+        if len(latencies) >= count:
+            rabbitmq_util.stop_consuming()
+    
+    try:
+        with _quiet():
+            rabbitmq_util.declare_queue(queue_name)
+            ready.set()
+            if ack_mode == 'batch':
+                rabbitmq_util.consume_batches(queue_name, on_batch, max_batch=prefetch, max_wait_ms=50)
+            else:
+                rabbitmq_util.consume_messages(queue_name, on_message, auto_ack=ack_mode == 'auto',
+                                               prefetch_count=prefetch)
+            rabbitmq_util.close()
+        results.put({'latencies': latencies, 'first': times[0] if times else None,
+                     'last': times[-1] if times else None})
+    except Exception as e:
+        ready.set()
+        results.put({'error': str(e)})
+
+
+def run_case(queue_name, count, size, prefetch, persistence, ack_mode, publish_mode,
+             publish_batch=500, compression=None, timeout=120):
+    """
+    运行一组参数的测试
+    :return: 结果字典，包括发送/消费速率（msgs/sec）和端到端延迟（毫秒）
+    """
+    case = {
+        'size': size,
+        'prefetch': prefetch,
+        'persistence': persistence,
+        'ack_mode': ack_mode,
+        'publish_mode': publish_mode,
+        'count': count
+    }
+    with _quiet():
+        rabbitmq_util.declare_queue(queue_name).queue_purge(queue=queue_name)
+    
+    context = multiprocessing.get_context('spawn')
+    ready = context.Event()
+    results = context.Queue()
+    consumer = context.Process(target=_consume_worker,
+                               args=(queue_name, count, prefetch, ack_mode, compression, ready, results))
+    consumer.start()
+    try:
+        ready.wait(timeout)
+        # 消息体为随机数据，避免压缩或服务端对重复数据的优化影响结果
+        padding = os.urandom(max(size - _HEADER.size, 0))
+        start = time.time()
+        with _quiet():
+            for offset in range(0, count, publish_batch):
+                # 每条消息在生成时单独记录时间戳，同一批的消息不共用发送时间
+                batch = [_HEADER.pack(time.time()) + padding for _ in range(min(publish_batch, count - offset))]
+                rabbitmq_util.publish_batch(queue_name, batch, confirm=publish_mode == 'confirm', codec='raw',
+                                            persistent=persistence == 'persistent')
+        publish_seconds = time.time() - start
+        
+        try:
+            consumed = results.get(timeout=timeout)
+        except queue.Empty:
+            consumed = {'error': f"{timeout} 秒内未消费完 {count} 条消息"}
+    finally:
+        consumer.join(timeout=10)
+        if consumer.is_alive():
+            consumer.terminate()
+    
+    case['publish_msgs_per_sec'] = round(count / publish_seconds, 1) if publish_seconds > 0 else None
+    if 'error' in consumed:
+        case['error'] = consumed['error']
+        return case
+    
+    latencies = sorted(consumed['latencies'])
+    consume_seconds = consumed['last'] - start
+    case['consume_msgs_per_sec'] = round(len(latencies) / consume_seconds, 1) if consume_seconds > 0 else None
+    case['latency_ms'] = {
+        'p50': round(_percentile(latencies, 50) * 1000, 3),
+        'p99': round(_percentile(latencies, 99) * 1000, 3),
+        'max': round(latencies[-1] * 1000, 3)
+    }
+    return case
+
+
+def _split(value, cast=str):
+    return [cast(item.strip()) for item in value.split(',') if item.strip()]
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='RabbitMQUtil 吞吐量与延迟基准测试')
+    parser.add_argument('--count', type=int, default=10000, help='每组参数发送的消息数')
+    parser.add_argument('--sizes', default='128,4096', help='消息大小（字节），逗号分隔')
+    parser.add_argument('--prefetch', default='10,200', help='消费者 prefetch_count（批量确认时为每批条数），逗号分隔')
+    parser.add_argument('--persistence', default='persistent,transient', help=f"可选: {','.join(PERSISTENCE)}")
+    parser.add_argument('--ack-modes', default='auto,batch', help=f"消费确认方式，可选: {','.join(ACK_MODES)}")
+    parser.add_argument('--publish-modes', default='plain', help=f"发送方式，可选: {','.join(PUBLISH_MODES)}")
+    parser.add_argument('--publish-batch', type=int, default=500, help='每次 publish_batch 发送的消息数，测量单条延迟时可设为 1')
+    parser.add_argument('--compression', default='', help='压缩方式，默认不压缩')
+    parser.add_argument('--queue', default='th_cnd_utils.benchmark', help='测试队列名，结束后删除')
+    parser.add_argument('--timeout', type=float, default=120, help='每组参数的最长等待时间（秒）')
+    parser.add_argument('--output', default='rabbitmq_benchmark.json', help='结果文件（JSON）')
+    args = parser.parse_args()
+    
+    persistence = _split(args.persistence)
+    ack_modes = _split(args.ack_modes)
+    publish_modes = _split(args.publish_modes)
+    for values, choices in ((persistence, PERSISTENCE), (ack_modes, ACK_MODES), (publish_modes, PUBLISH_MODES)):
+        unknown = set(values) - set(choices)
+        if unknown:
+            parser.error(f"不支持的参数: {', '.join(sorted(unknown))}，可选: {', '.join(choices)}")
+    
+    rabbitmq_util.compression = args.compression or None
+    report = {
+        'benchmark': 'rabbitmq',
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'host': f"{rabbitmq_util.host}:{rabbitmq_util.port}",
+        'pika_version': pika.__version__,
+        'python_version': sys.version.split()[0],
+        'count': args.count,
+        'publish_batch': args.publish_batch,
+        'compression': args.compression or None,
+        'results': []
+    }
+    
+    print(f"{'size':>7} {'prefetch':>8} {'persistence':>11} {'ack':>6} {'publish':>7} "
+          f"{'pub msg/s':>10} {'con msg/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    try:
+        for size, prefetch, mode, ack_mode, publish_mode in itertools.product(
+                _split(args.sizes, int), _split(args.prefetch, int), persistence, ack_modes, publish_modes):
+            case = run_case(args.queue, args.count, size, prefetch, mode, ack_mode, publish_mode,
+                            publish_batch=args.publish_batch, compression=args.compression or None,
+                            timeout=args.timeout)
+            report['results'].append(case)
+            if 'error' in case:
+                print(f"{size:>7} {prefetch:>8} {mode:>11} {ack_mode:>6} {publish_mode:>7} 失败: {case['error']}")
+                continue
+            print(f"{size:>7} {prefetch:>8} {mode:>11} {ack_mode:>6} {publish_mode:>7} "
+                  f"{case['publish_msgs_per_sec']:>10} {case['consume_msgs_per_sec']:>10} "
+                  f"{case['latency_ms']['p50']:>9} {case['latency_ms']['p99']:>9}")
+    finally:
+        with _quiet():
+            rabbitmq_util.connect().queue_delete(queue=args.queue)
+            rabbitmq_util.close()
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import os
 from dotenv import load_dotenv
 import oss2
+from ..instrumentation import instrumentation
 
 # 加载环境变量
 load_dotenv()
@@ -39,7 +40,10 @@ class OSSUtil:
         """上传对象"""
         try:
             client = self.connect()
-            result = client.put_object(object_name, data)
+            with instrumentation.track('oss', 'put_object', object_name) as op:
+                if isinstance(data, (str, bytes, bytearray)):
+                    op.bytes = len(data)
+                result = client.put_object(object_name, data)
             print(f"对象 '{object_name}' 上传成功")
             return result
         except Exception as e:
@@ -50,7 +54,9 @@ class OSSUtil:
         """获取对象"""
         try:
             client = self.connect()
-            result = client.get_object(object_name)
+            with instrumentation.track('oss', 'get_object', object_name) as op:
+                result = client.get_object(object_name)
+                op.bytes = result.content_length
             return result
         except Exception as e:
             print(f"获取对象失败: {e}")
@@ -60,7 +66,8 @@ class OSSUtil:
         """删除对象"""
         try:
             client = self.connect()
-            result = client.delete_object(object_name)
+            with instrumentation.track('oss', 'delete_object', object_name):
+                result = client.delete_object(object_name)
             print(f"对象 '{object_name}' 删除成功")
             return result
         except Exception as e:
@@ -71,7 +78,9 @@ class OSSUtil:
         """列出对象"""
         try:
             client = self.connect()
-            result = client.list_objects(prefix=prefix, max_keys=max_keys)
+            with instrumentation.track('oss', 'list_objects', prefix) as op:
+                result = client.list_objects(prefix=prefix, max_keys=max_keys)
+                op.rows = len(result.object_list)
             return result.object_list
         except Exception as e:
             print(f"列出对象失败: {e}")
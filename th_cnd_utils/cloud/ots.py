@@ -1,6 +1,7 @@
 import os
 from dotenv import load_dotenv
 from tablestore import *
+from ..instrumentation import instrumentation
 
 # 加载环境变量
 load_dotenv()
@@ -47,7 +48,8 @@ class OTSUtil:
         """创建表"""
         try:
             client = self.connect(instance_name)
-            result = client.create_table(table_meta, reserved_throughput)
+            with instrumentation.track('ots', 'create_table', table_meta.table_name):
+                result = client.create_table(table_meta, reserved_throughput)
             print(f"表格 '{table_meta.table_name}' 创建成功")
             return result
         except Exception as e:
@@ -59,7 +61,8 @@ class OTSUtil:
         try:
             client = self.connect(instance_name)
             row = Row(primary_key, attribute_columns)
-            result = client.put_row(table_name, RowPutChange(table_name, row))
+            with instrumentation.track('ots', 'put_row', table_name):
+                result = client.put_row(table_name, RowPutChange(table_name, row))
             print(f"数据插入成功")
             return result
         except Exception as e:
@@ -71,7 +74,8 @@ class OTSUtil:
         try:
             client = self.connect(instance_name)
             row = Row(primary_key)
-            result = client.get_row(table_name, RowGetChange(table_name, row, columns_to_get))
+            with instrumentation.track('ots', 'get_row', table_name):
+                result = client.get_row(table_name, RowGetChange(table_name, row, columns_to_get))
             return result
         except Exception as e:
             print(f"获取数据失败: {e}")
@@ -82,7 +86,8 @@ class OTSUtil:
         try:
             client = self.connect(instance_name)
             row = Row(primary_key)
-            result = client.delete_row(table_name, RowDeleteChange(table_name, row))
+            with instrumentation.track('ots', 'delete_row', table_name):
+                result = client.delete_row(table_name, RowDeleteChange(table_name, row))
             print(f"数据删除成功")
             return result
         except Exception as e:
@@ -94,7 +99,8 @@ class OTSUtil:
         try:
             client = self.connect(instance_name)
             row = Row(primary_key, attribute_columns)
-            result = client.update_row(table_name, RowUpdateChange(table_name, row))
+            with instrumentation.track('ots', 'update_row', table_name):
+                result = client.update_row(table_name, RowUpdateChange(table_name, row))
             print(f"数据更新成功")
             return result
         except Exception as e:
@@ -105,7 +111,8 @@ class OTSUtil:
         """批量写入数据"""
         try:
             client = self.connect(instance_name)
-            result = client.batch_write_row(request)
+            with instrumentation.track('ots', 'batch_write_row'):
+                result = client.batch_write_row(request)
             print(f"批量写入操作完成")
             return result
         except Exception as e:
@@ -116,7 +123,8 @@ class OTSUtil:
         """批量读取数据"""
         try:
             client = self.connect(instance_name)
-            result = client.batch_get_row(request)
+            with instrumentation.track('ots', 'batch_get_row'):
+                result = client.batch_get_row(request)
             print(f"批量读取操作完成")
             return result
         except Exception as e:
@@ -132,7 +140,8 @@ class OTSUtil:
             request = GetRangeRequest(table_name, direction, 
                                     inclusive_start_primary_key, exclusive_end_primary_key,
                                     columns_to_get=columns_to_get, limit=limit)
-            result = client.get_range(request)
+            with instrumentation.track('ots', 'get_range', table_name):
+                result = client.get_range(request)
             return result
         except Exception as e:
             print(f"范围查询失败: {e}")
@@ -144,7 +153,8 @@ class OTSUtil:
         try:
             client = self.connect(instance_name)
             request = SearchRequest(table_name, index_name, search_query, columns_to_get=columns_to_get)
-            result = client.search(request)
+            with instrumentation.track('ots', 'search', table_name):
+                result = client.search(request)
             return result
         except Exception as e:
             print(f"索引查询失败: {e}")
@@ -154,7 +164,8 @@ class OTSUtil:
         """创建搜索索引"""
         try:
             client = self.connect(instance_name)
-            result = client.create_search_index(table_name, index_name, index_schema)
+            with instrumentation.track('ots', 'create_search_index', table_name):
+                result = client.create_search_index(table_name, index_name, index_schema)
             print(f"搜索索引 '{index_name}' 创建成功")
             return result
         except Exception as e:
@@ -165,7 +176,8 @@ class OTSUtil:
         """删除搜索索引"""
         try:
             client = self.connect(instance_name)
-            result = client.delete_search_index(table_name, index_name)
+            with instrumentation.track('ots', 'delete_search_index', table_name):
+                result = client.delete_search_index(table_name, index_name)
             print(f"搜索索引 '{index_name}' 删除成功")
             return result
         except Exception as e:
@@ -176,7 +188,8 @@ class OTSUtil:
         """列出搜索索引"""
         try:
             client = self.connect(instance_name)
-            result = client.list_search_index(table_name)
+            with instrumentation.track('ots', 'list_search_index', table_name):
+                result = client.list_search_index(table_name)
             return result
         except Exception as e:
             print(f"列出搜索索引失败: {e}")
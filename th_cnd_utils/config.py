@@ -12,7 +12,22 @@ config = {
         'port': int(os.getenv('MYSQL_PORT', 3306)),
         'user': os.getenv('MYSQL_USER', 'root'),
         'password': os.getenv('MYSQL_PASSWORD', ''),
-        'database': os.getenv('MYSQL_DATABASE', 'test')
+        'database': os.getenv('MYSQL_DATABASE', 'test'),
+        # 连接池配置
+        'pool_min_size': int(os.getenv('MYSQL_POOL_MIN_SIZE', 1)),
+        'pool_max_size': int(os.getenv('MYSQL_POOL_MAX_SIZE', 10)),
+        'pool_timeout': float(os.getenv('MYSQL_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.getenv('MYSQL_POOL_RECYCLE', 3600)),
+        # 连接空闲超过该秒数后，取出时先 ping 检测是否存活
+        'pool_ping_interval': float(os.getenv('MYSQL_POOL_PING_INTERVAL', 30)),
+        # 读写分离配置：从库列表（host[:port]，逗号分隔）、读策略（round_robin/least_outstanding）、
+        # 写入后当前线程读主库的时间窗口（秒）
+        'replica_hosts': [h.strip() for h in os.getenv('MYSQL_REPLICA_HOSTS', '').split(',') if h.strip()],
+        'read_strategy': os.getenv('MYSQL_READ_STRATEGY', 'round_robin'),
+        'sticky_seconds': float(os.getenv('MYSQL_STICKY_SECONDS', 2)),
+        # 从库连接超时（秒），以及连接失败后暂停使用该从库的时间（秒）
+        'replica_connect_timeout': float(os.getenv('MYSQL_REPLICA_CONNECT_TIMEOUT', 2)),
+        'replica_cooldown': float(os.getenv('MYSQL_REPLICA_COOLDOWN', 30))
     },
     
     # Redis 配置
@@ -20,7 +35,24 @@ config = {
         'host': os.getenv('REDIS_HOST', 'localhost'),
         'port': int(os.getenv('REDIS_PORT', 6379)),
         'password': os.getenv('REDIS_PASSWORD', ''),
-        'db': int(os.getenv('REDIS_DB', 0))
+        'db': int(os.getenv('REDIS_DB', 0)),
+        # 连接池配置
+        'max_connections': int(os.getenv('REDIS_MAX_CONNECTIONS', 50)),
+        'pool_timeout': float(os.getenv('REDIS_POOL_TIMEOUT', 5)),
+        # 读写超时默认不设置：BLPOP、XREAD BLOCK 等阻塞命令的等待时间可能超过任何固定值
+        'socket_timeout': float(os.getenv('REDIS_SOCKET_TIMEOUT')) if os.getenv('REDIS_SOCKET_TIMEOUT') else None,
+        'socket_connect_timeout': float(os.getenv('REDIS_SOCKET_CONNECT_TIMEOUT', 5)),
+        'socket_keepalive': os.getenv('REDIS_SOCKET_KEEPALIVE', 'true').lower() in ('1', 'true', 'yes'),
+        'health_check_interval': int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', 30)),
+        'retries': int(os.getenv('REDIS_RETRIES', 3)),
+        # 值编码配置：text（字符串，不编码）、raw（二进制）、json、msgpack、pickle；
+        # 压缩方式 zlib/gzip/lz4/zstd，留空不压缩
+        'codec': os.getenv('REDIS_CODEC', 'text'),
+        'compression': os.getenv('REDIS_COMPRESSION', 'zlib'),
+        'compress_threshold': int(os.getenv('REDIS_COMPRESS_THRESHOLD', 1024)),
+        # TieredCache/查询缓存写入 Redis 时的编码：json 或 msgpack；
+        # pickle 读取时可以执行任意代码，只应在 Redis 仅由可信进程写入时显式开启
+        'cache_codec': os.getenv('REDIS_CACHE_CODEC', 'json')
     },
     
     # RabbitMQ 配置
@@ -29,12 +61,43 @@ config = {
         'port': int(os.getenv('RABBITMQ_PORT', 5672)),
         'user': os.getenv('RABBITMQ_USER', 'guest'),
         'password': os.getenv('RABBITMQ_PASSWORD', 'guest'),
-        'vhost': os.getenv('RABBITMQ_VHOST', '/')
+        'vhost': os.getenv('RABBITMQ_VHOST', '/'),
+        # 发布确认：最多允许的未确认消息数，以及等待确认的超时时间（秒）
+        'confirm_window': int(os.getenv('RABBITMQ_CONFIRM_WINDOW', 1000)),
+        'confirm_timeout': float(os.getenv('RABBITMQ_CONFIRM_TIMEOUT', 30)),
+        # 消费者未确认消息上限，0 表示与工作线程/进程数相同（至少为 1）
+        'prefetch_count': int(os.getenv('RABBITMQ_PREFETCH_COUNT', 0)),
+        # 心跳间隔（秒），用于及时发现失效连接
+        'heartbeat': int(os.getenv('RABBITMQ_HEARTBEAT', 60)),
+        # 断线重连：初始等待、最长等待（秒）和最大重试次数（0 表示不限）
+        'reconnect_delay': float(os.getenv('RABBITMQ_RECONNECT_DELAY', 1)),
+        'reconnect_max_delay': float(os.getenv('RABBITMQ_RECONNECT_MAX_DELAY', 30)),
+        'reconnect_attempts': int(os.getenv('RABBITMQ_RECONNECT_ATTEMPTS', 0)),
+        # 连接不可用时本地暂存的待发送消息数上限
+        'publish_buffer_size': int(os.getenv('RABBITMQ_PUBLISH_BUFFER_SIZE', 10000)),
+        # 消息编码配置：text（字典转 JSON 字符串，其余原样发送）、raw（二进制）、json、msgpack、pickle；
+        # 非 text 编码的消息超过阈值时按 compression（zlib/gzip/lz4/zstd，留空不压缩）压缩，
+        # 编码和压缩方式写入 content_type/content_encoding，消费时自动还原
+        'codec': os.getenv('RABBITMQ_CODEC', 'text'),
+        'compression': os.getenv('RABBITMQ_COMPRESSION', 'gzip'),
+        'compress_threshold': int(os.getenv('RABBITMQ_COMPRESS_THRESHOLD', 1024)),
+        # 消费时允许解码的编码方式，其他 content_type 的消息体保持原始 bytes；
+        # pickle 解码可以执行任意代码，只应在信任全部生产者时加入
+        'accept': [c.strip() for c in os.getenv('RABBITMQ_ACCEPT', 'json,msgpack,raw').split(',') if c.strip()]
     },
     
     # SQLite 配置
     'sqlite': {
-        'path': os.getenv('SQLITE_PATH', './database.sqlite')
+        'path': os.getenv('SQLITE_PATH', './database.sqlite'),
+        # 连接后执行的 PRAGMA，留空表示使用 SQLite 默认值：
+        # WAL 模式下读写互不阻塞，synchronous=NORMAL 只在检查点时 fsync；
+        # cache_size 为负数时单位为 KiB；busy_timeout 为遇到锁时的等待毫秒数
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'cache_size': os.getenv('SQLITE_CACHE_SIZE', '-64000'),
+        'mmap_size': os.getenv('SQLITE_MMAP_SIZE', '268435456'),
+        'temp_store': os.getenv('SQLITE_TEMP_STORE', 'MEMORY'),
+        'busy_timeout': os.getenv('SQLITE_BUSY_TIMEOUT', '5000')
     },
     
     # 阿里云配置
@@ -54,5 +117,11 @@ config = {
     'oss': {
         'endpoint': os.getenv('OSS_ENDPOINT', ''),
         'bucket_name': os.getenv('OSS_BUCKET_NAME', '')
+    },
+    
+    # 耗时统计配置
+    'metrics': {
+        'enabled': os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes'),
+        'slow_threshold_ms': float(os.getenv('SLOW_OPERATION_THRESHOLD_MS', 500))
     }
 }
\ No newline at end of file
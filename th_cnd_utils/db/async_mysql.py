@@ -0,0 +1,207 @@
+import aiomysql
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+from ..config import config
+from .mysql import _chunked
+from ..instrumentation import instrumentation
+
+# 加载环境变量
+load_dotenv()
+
+class AsyncMySQLUtil:
+    _instance = None
+    _pool = None
+    _pool_lock = None
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(AsyncMySQLUtil, cls).__new__(cls)
+        return cls._instance
+    
+    def __init__(self):
+        if not hasattr(self, 'initialized'):
+            self.initialized = True
+            self.host = os.getenv('MYSQL_HOST', 'localhost')
+            self.port = int(os.getenv('MYSQL_PORT', 3306))
+            self.user = os.getenv('MYSQL_USER', 'root')
+            self.password = os.getenv('MYSQL_PASSWORD', '')
+            self.database = os.getenv('MYSQL_DATABASE', 'test')
+            self.pool_min_size = config['mysql']['pool_min_size']
+            self.pool_max_size = config['mysql']['pool_max_size']
+            self.pool_timeout = config['mysql']['pool_timeout']
+            self.pool_recycle = config['mysql']['pool_recycle']
+    
+    async def connect(self):
+        """建立异步数据库连接池"""
+        try:
+            if not self._pool:
+                if self._pool_lock is None:
+                    self._pool_lock = asyncio.Lock()
+                async with self._pool_lock:
+                    if not self._pool:
+                        self._pool = await aiomysql.create_pool(
+                            host=self.host,
+                            port=self.port,
+                            user=self.user,
+                            password=self.password,
+                            db=self.database,
+                            charset='utf8mb4',
+                            cursorclass=aiomysql.DictCursor,
+                            minsize=self.pool_min_size,
+                            maxsize=self.pool_max_size,
+                            pool_recycle=self.pool_recycle
+                        )
+                        print("MySQL 异步连接成功")
+            return self._pool
+        except Exception as e:
+            print(f"MySQL 异步连接失败: {e}")
+            raise e
+    
+    @asynccontextmanager
+    async def connection(self):
+        """从连接池借出一个连接，退出时自动归还；发生异常时回滚"""
+        pool = await self.connect()
+        connection = await asyncio.wait_for(pool.acquire(), self.pool_timeout)
+        try:
+            yield connection
+        except Exception:
+            try:
+                await connection.rollback()
+            except Exception:
+                connection.close()
+            raise
+        finally:
+            await self._release(pool, connection)
+    
+    @staticmethod
+    async def _release(pool, connection):
+        """
+        归还连接前回滚未结束的事务：aiomysql 的连接池会直接关闭仍处于事务中的连接，
+        而未开启 autocommit 时普通 SELECT 也会开启隐式事务
+        """
+        if not connection.closed and connection.get_transaction_status():
+            try:
+                await connection.rollback()
+            except Exception:
+                connection.close()
+        pool.release(connection)
+    
+    async def execute_query(self, sql, params=None):
+        """执行查询语句"""
+        try:
+            with instrumentation.track('mysql', 'query', sql) as op:
+                async with self.connection() as connection:
+                    async with connection.cursor() as cursor:
+                        await cursor.execute(sql, params)
+                        result = await cursor.fetchall()
+                op.rows = len(result)
+            return result
+        except Exception as e:
+            print(f"查询执行失败: {e}")
+            raise e
+    
+    async def iter_query(self, sql, params=None, chunk_size=1000, as_dict=True, yield_chunks=False):
+        """
+        使用服务端游标流式读取查询结果
+        :param sql: 查询语句
+        :param params: 查询参数
+        :param chunk_size: 每次从服务端读取的行数
+        :param as_dict: True 返回字典行，False 返回元组行
+        :param yield_chunks: True 时按块返回行列表，否则逐行返回
+        """
+        cursor_class = aiomysql.SSDictCursor if as_dict else aiomysql.SSCursor
+        pool = await self.connect()
+        connection = await asyncio.wait_for(pool.acquire(), self.pool_timeout)
+        finished = False
+        # 耗时统计覆盖整个流式读取过程
+        start = time.perf_counter()
+        row_count = 0
+        error = None
+        try:
+            cursor = await connection.cursor(cursor_class)
+            await cursor.execute(sql, params)
+            while True:
+                rows = await cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                row_count += len(rows)
+                if yield_chunks:
+                    yield rows
+                else:
+                    for row in rows:
+                        yield row
+            await cursor.close()
+            finished = True
+        except Exception as e:
+            error = e
+            print(f"流式查询失败: {e}")
+            raise e
+        finally:
+            # 未读完的流式结果会占住连接，提前中止时直接丢弃该连接
+            if not finished:
+                connection.close()
+            await self._release(pool, connection)
+            if instrumentation.enabled:
+                instrumentation.observe('mysql', 'iter_query', time.perf_counter() - start,
+                                        rows=row_count, error=error, statement=sql)
+    
+    async def execute_update(self, sql, params=None):
+        """执行更新语句（INSERT, UPDATE, DELETE）"""
+        try:
+            with instrumentation.track('mysql', 'update', sql) as op:
+                async with self.connection() as connection:
+                    async with connection.cursor() as cursor:
+                        result = await cursor.execute(sql, params)
+                        await connection.commit()
+                op.rows = result
+            return result
+        except Exception as e:
+            print(f"更新执行失败: {e}")
+            raise e
+    
+    async def execute_many(self, sql, rows, batch_size=1000):
+        """
+        批量执行同一条语句，每批提交一次
+        :param sql: SQL 语句
+        :param rows: 参数序列
+        :param batch_size: 每批的行数
+        :return: 影响的总行数
+        """
+        try:
+            affected = 0
+            with instrumentation.track('mysql', 'execute_many', sql) as op:
+                async with self.connection() as connection:
+                    async with connection.cursor() as cursor:
+                        for batch in _chunked(rows, batch_size):
+                            affected += await cursor.executemany(sql, batch) or 0
+                            await connection.commit()
+                op.rows = affected
+            return affected
+        except Exception as e:
+            print(f"批量执行失败: {e}")
+            raise e
+    
+    def pool_stats(self):
+        """获取连接池使用情况"""
+        if not self._pool:
+            return None
+        return {
+            'size': self._pool.size,
+            'idle': self._pool.freesize,
+            'in_use': self._pool.size - self._pool.freesize,
+            'max_size': self._pool.maxsize
+        }
+    
+    async def close(self):
+        """关闭数据库连接"""
+        if self._pool:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+            print("MySQL 异步连接已关闭")
+
+# 创建单例实例
+async_mysql_util = AsyncMySQLUtil()
@@ -0,0 +1,213 @@
+import aio_pika
+import asyncio
+import os
+from dotenv import load_dotenv
+from ..config import config
+from ..instrumentation import instrumentation
+from .rabbitmq import RabbitMQUtil, CODEC_HEADER
+
+# 加载环境变量
+load_dotenv()
+
+class AsyncRabbitMQUtil:
+    _instance = None
+    _connection = None
+    _channel = None
+    _connect_lock = None
+    # 已声明过的队列；RobustChannel 重连后会自动重新声明
+    _declared_queues = None
+    # consumer_tag -> 队列对象
+    _consumers = None
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(AsyncRabbitMQUtil, cls).__new__(cls)
+        return cls._instance
+    
+    def __init__(self):
+        if not hasattr(self, 'initialized'):
+            self.initialized = True
+            self.host = os.getenv('RABBITMQ_HOST', 'localhost')
+            self.port = int(os.getenv('RABBITMQ_PORT', 5672))
+            self.user = os.getenv('RABBITMQ_USER', 'guest')
+            self.password = os.getenv('RABBITMQ_PASSWORD', 'guest')
+            self.vhost = os.getenv('RABBITMQ_VHOST', '/')
+            self.confirm_window = config['rabbitmq']['confirm_window']
+            self.confirm_timeout = config['rabbitmq']['confirm_timeout']
+            self.prefetch_count = config['rabbitmq']['prefetch_count']
+            self.codec = config['rabbitmq']['codec']
+            self.compression = config['rabbitmq']['compression'] or None
+            self.compress_threshold = config['rabbitmq']['compress_threshold']
+            self.accept = tuple(config['rabbitmq']['accept'])
+    
+    async def connect(self):
+        """建立异步 RabbitMQ 连接，连接断开后自动重连并恢复队列和消费者"""
+        try:
+            if not self._channel:
+                if self._connect_lock is None:
+                    self._connect_lock = asyncio.Lock()
+                async with self._connect_lock:
+                    if not self._channel:
+                        self._connection = await aio_pika.connect_robust(
+                            host=self.host,
+                            port=self.port,
+                            login=self.user,
+                            password=self.password,
+                            virtualhost=self.vhost
+                        )
+                        # 开启发布确认，publish 在服务端确认后返回
+                        self._channel = await self._connection.channel(publisher_confirms=True)
+                        self._declared_queues = {}
+                        self._consumers = {}
+                        print("RabbitMQ 异步连接成功")
+            return self._channel
+        except Exception as e:
+            print(f"RabbitMQ 异步连接失败: {e}")
+            raise e
+    
+    async def declare_queue(self, queue):
+        """声明持久化队列，只声明一次"""
+        channel = await self.connect()
+        declared = self._declared_queues.get(queue)
+        if declared is None:
+            declared = await channel.declare_queue(queue, durable=True)
+            self._declared_queues[queue] = declared
+        return declared
+    
+    def _build_message(self, message, codec=None):
+        """编码消息，与 RabbitMQUtil 使用相同的编码和 content_type/content_encoding 约定"""
+        codec = codec or self.codec
+        body, content_type, content_encoding = RabbitMQUtil._encode_message(
+            message, codec, self.compression, self.compress_threshold)
+        return aio_pika.Message(body, content_type=content_type, content_encoding=content_encoding,
+                                headers={CODEC_HEADER: codec} if content_type else None,
+                                delivery_mode=aio_pika.DeliveryMode.PERSISTENT)
+    
+    async def send_message(self, queue, message, codec=None):
+        """
+        发送消息到队列，等待服务端确认后返回，被拒绝或超时时抛出异常
+        :param codec: 消息编码方式，默认使用 RABBITMQ_CODEC
+        """
+        try:
+            await self.declare_queue(queue)
+            message = self._build_message(message, codec)
+            with instrumentation.track('rabbitmq', 'publish', queue) as op:
+                op.bytes = len(message.body)
+                await self._channel.default_exchange.publish(message, routing_key=queue,
+                                                             timeout=self.confirm_timeout)
+            print(f"消息已发送到队列 '{queue}'")
+        except Exception as e:
+            print(f"发送消息失败: {e}")
+            raise e
+    
+    async def publish_batch(self, queue, messages, codec=None):
+        """
+        批量发送消息，最多同时等待 confirm_window（RABBITMQ_CONFIRM_WINDOW）条消息的确认
+        :param queue: 队列名
+        :param messages: 消息列表，按 codec 编码，text 编码时字典会转换为 JSON 字符串
+        :param codec: 消息编码方式，默认使用 RABBITMQ_CODEC
+        :return: 发送的消息数
+        """
+        try:
+            await self.declare_queue(queue)
+            exchange = self._channel.default_exchange
+            window = asyncio.Semaphore(self.confirm_window)
+            
+            async def publish(message):
+                async with window:
+                    await exchange.publish(message, routing_key=queue, timeout=self.confirm_timeout)
+            
+            messages = [self._build_message(message, codec) for message in messages]
+            with instrumentation.track('rabbitmq', 'publish_batch', queue) as op:
+                op.rows = len(messages)
+                op.bytes = sum(len(message.body) for message in messages)
+                await asyncio.gather(*(publish(message) for message in messages))
+            print(f"{len(messages)} 条消息已发送到队列 '{queue}'")
+            return len(messages)
+        except Exception as e:
+            print(f"批量发送消息失败: {e}")
+            raise e
+    
+    async def consume_messages(self, queue, callback, auto_ack=False, prefetch_count=None, concurrency=10,
+                               accept=None):
+        """
+        注册消费者并立即返回，消息在后台处理
+        :param queue: 队列名
+        :param callback: 异步消息处理函数，参数为 message_info 字典，包含 body/message/properties，
+                         body 按消息的 content_type/content_encoding 解码，不允许解码的消息为原始 bytes，
+                         手动确认时调用 await message_info['message'].ack()
+        :param auto_ack: 回调成功后自动确认，回调抛出异常时拒绝并重新入队
+        :param prefetch_count: 未确认消息数上限，默认使用 RABBITMQ_PREFETCH_COUNT，未配置时等于 concurrency
+        :param concurrency: 同时执行的回调数上限
+        :param accept: 允许解码的编码方式，默认使用 RABBITMQ_ACCEPT（json/msgpack/raw），pickle 需要显式加入
+        :return: consumer_tag，可传给 stop_consuming
+        """
+        accept = tuple(self.accept if accept is None else accept)
+        try:
+            declared = await self.declare_queue(queue)
+            await self._channel.set_qos(prefetch_count=prefetch_count or self.prefetch_count or concurrency)
+            semaphore = asyncio.Semaphore(concurrency)
+            
+            async def wrapper(message):
+                async with semaphore:
+                    try:
+                        body = RabbitMQUtil._decode_body(message.body, message, accept)
+                    except Exception as e:
+                        # 无法解码的消息重新投递后仍会失败，直接拒绝且不重新入队
+                        print(f"解码消息失败，已拒绝: {e}")
+                        await message.reject(requeue=False)
+                        return
+                    try:
+                        message_info = {
+                            'body': body,
+                            'message': message,
+                            'properties': message.properties
+                        }
+                        with instrumentation.track('rabbitmq', 'consume', queue) as op:
+                            op.bytes = len(message.body)
+                            await callback(message_info)
+                        
+                        # 如果启用了自动确认，则自动确认消息
+                        if auto_ack:
+                            await message.ack()
+                    except Exception as e:
+                        print(f"处理消息失败: {e}")
+                        # 如果启用了自动确认，则拒绝消息并重新入队
+                        if auto_ack:
+                            await message.nack(requeue=True)
+            
+            consumer_tag = await declared.consume(wrapper, no_ack=False)
+            self._consumers[consumer_tag] = declared
+            print(f"开始消费队列 '{queue}' 中的消息")
+            return consumer_tag
+        except Exception as e:
+            print(f"消费消息失败: {e}")
+            raise e
+    
+    async def stop_consuming(self, consumer_tag=None):
+        """停止消费，consumer_tag 为 None 时停止全部消费者"""
+        try:
+            if not self._consumers:
+                return
+            tags = [consumer_tag] if consumer_tag else list(self._consumers)
+            for tag in tags:
+                declared = self._consumers.pop(tag, None)
+                if declared is not None:
+                    await declared.cancel(tag)
+            print("已停止消费消息")
+        except Exception as e:
+            print(f"停止消费消息失败: {e}")
+            raise e
+    
+    async def close(self):
+        """关闭 RabbitMQ 连接"""
+        if self._connection:
+            await self._connection.close()
+            self._connection = None
+            self._channel = None
+            self._declared_queues = None
+            self._consumers = None
+            print("RabbitMQ 异步连接已关闭")
+
+# 创建单例实例
+async_rabbitmq_util = AsyncRabbitMQUtil()
@@ -0,0 +1,492 @@
+import redis
+import redis.asyncio as aioredis
+import asyncio
+import os
+import time
+from redis.backoff import ExponentialBackoff
+from redis.asyncio.retry import Retry
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+from ..config import config
+from ..instrumentation import instrumentation
+from ..serialization import pack, unpack
+from .redis import _chunked
+
+# 加载环境变量
+load_dotenv()
+
+class AsyncRedisConnectionPool(aioredis.BlockingConnectionPool):
+    """连接用尽时挂起等待的异步 Redis 连接池，额外统计等待次数和等待耗时"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waits = 0
+        self.wait_timeouts = 0
+        self.wait_seconds = 0.0
+    
+    async def get_connection(self, *args, **kwargs):
+        # 没有可用连接时需要等待其他协程归还
+        if self.can_get_connection():
+            return await super().get_connection(*args, **kwargs)
+        start = time.monotonic()
+        timed_out = False
+        try:
+            return await super().get_connection(*args, **kwargs)
+        except (redis.ConnectionError, asyncio.TimeoutError):
+            timed_out = True
+            raise
+        finally:
+            self.waits += 1
+            self.wait_seconds += time.monotonic() - start
+            if timed_out:
+                self.wait_timeouts += 1
+    
+    def stats(self):
+        """连接池使用情况"""
+        idle = len(self._available_connections)
+        in_use = len(self._in_use_connections)
+        return {
+            'max_connections': self.max_connections,
+            'created': idle + in_use,
+            'idle': idle,
+            'in_use': in_use,
+            'waits': self.waits,
+            'wait_timeouts': self.wait_timeouts,
+            'wait_seconds': self.wait_seconds
+        }
+
+class AsyncRedisPipeline:
+    """命令数达到 flush_size 时自动提交的异步 Redis 管道，命令需要 await，执行结果按顺序累积在 results 中"""
+    
+    def __init__(self, pipeline, flush_size=1000):
+        self._pipeline = pipeline
+        self.flush_size = flush_size
+        self.results = []
+        self._pending = 0
+    
+    def __getattr__(self, name):
+        attr = getattr(self._pipeline, name)
+        if not callable(attr):
+            return attr
+        
+        async def command(*args, **kwargs):
+            attr(*args, **kwargs)
+            self._pending += 1
+            if self._pending >= self.flush_size:
+                await self.flush()
+            return self
+        return command
+    
+    def __len__(self):
+        return self._pending
+    
+    async def flush(self):
+        """提交已缓冲的命令"""
+        if self._pending:
+            with instrumentation.track('redis', 'pipeline') as op:
+                op.rows = self._pending
+                self.results.extend(await self._pipeline.execute())
+            self._pending = 0
+        return self.results
+    
+    execute = flush
+    
+    async def reset(self):
+        """丢弃未提交的命令"""
+        await self._pipeline.reset()
+        self._pending = 0
+
+class AsyncRedisUtil:
+    _instance = None
+    _client = None
+    _pool = None
+    _binary_client = None
+    _binary_pool = None
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(AsyncRedisUtil, cls).__new__(cls)
+        return cls._instance
+    
+    def __init__(self):
+        if not hasattr(self, 'initialized'):
+            self.initialized = True
+            self.host = os.getenv('REDIS_HOST', 'localhost')
+            self.port = int(os.getenv('REDIS_PORT', 6379))
+            self.password = os.getenv('REDIS_PASSWORD', '')
+            self.db = int(os.getenv('REDIS_DB', 0))
+            self.max_connections = config['redis']['max_connections']
+            self.pool_timeout = config['redis']['pool_timeout']
+            self.socket_timeout = config['redis']['socket_timeout']
+            self.socket_connect_timeout = config['redis']['socket_connect_timeout']
+            self.socket_keepalive = config['redis']['socket_keepalive']
+            self.health_check_interval = config['redis']['health_check_interval']
+            self.retries = config['redis']['retries']
+            # 值编码配置
+            self.codec = config['redis']['codec']
+            self.compression = config['redis']['compression'] or None
+            self.compress_threshold = config['redis']['compress_threshold']
+    
+    def _create_client(self, decode_responses):
+        """按连接池配置创建客户端"""
+        pool = AsyncRedisConnectionPool(
+            max_connections=self.max_connections,
+            timeout=self.pool_timeout,
+            host=self.host,
+            port=self.port,
+            password=self.password if self.password else None,
+            db=self.db,
+            decode_responses=decode_responses,
+            socket_timeout=self.socket_timeout,
+            socket_connect_timeout=self.socket_connect_timeout,
+            socket_keepalive=self.socket_keepalive,
+            health_check_interval=self.health_check_interval
+        )
+        # 故障切换期间的连接错误和超时按指数退避重试
+        client = aioredis.Redis(
+            connection_pool=pool,
+            retry=Retry(ExponentialBackoff(cap=1, base=0.05), self.retries),
+            retry_on_error=[redis.ConnectionError, redis.TimeoutError]
+        )
+        return pool, client
+    
+    async def connect(self):
+        """建立异步 Redis 连接"""
+        try:
+            if not self._client:
+                pool, client = self._create_client(decode_responses=True)
+                # 测试连接
+                await client.ping()
+                # 并发调用时只保留先完成的客户端
+                if self._client:
+                    await pool.disconnect()
+                else:
+                    self._pool, self._client = pool, client
+                    print("Redis 异步连接成功")
+            return self._client
+        except Exception as e:
+            print(f"Redis 异步连接失败: {e}")
+            raise e
+    
+    def connect_binary(self):
+        """建立不解码响应的异步 Redis 连接，用于读写二进制值"""
+        if not self._binary_client:
+            self._binary_pool, self._binary_client = self._create_client(decode_responses=False)
+        return self._binary_client
+    
+    async def _get_client(self, codec):
+        if codec == 'text':
+            return await self.connect()
+        return self.connect_binary()
+    
+    def _encode(self, value, codec):
+        return pack(value, codec, self.compression, self.compress_threshold)
+    
+    async def get(self, key, codec=None):
+        """
+        获取键值
+        :param codec: 值编码方式，默认使用 REDIS_CODEC：text（字符串，不编码）、raw（二进制）、json、msgpack、pickle
+        """
+        try:
+            codec = codec or self.codec
+            client = await self._get_client(codec)
+            with instrumentation.track('redis', 'get', key) as op:
+                value = await client.get(key)
+                if isinstance(value, (str, bytes)):
+                    op.bytes = len(value)
+            if codec == 'text':
+                return value
+            return unpack(value, codec)
+        except Exception as e:
+            print(f"获取键值失败: {e}")
+            raise e
+    
+    async def set(self, key, value, expire_seconds=None, codec=None):
+        """
+        设置键值
+        :param codec: 值编码方式，默认使用 REDIS_CODEC，非 text 时超过 REDIS_COMPRESS_THRESHOLD 字节的值会被压缩
+        """
+        try:
+            codec = codec or self.codec
+            client = await self._get_client(codec)
+            if codec != 'text':
+                value = self._encode(value, codec)
+            with instrumentation.track('redis', 'set', key) as op:
+                if isinstance(value, (str, bytes)):
+                    op.bytes = len(value)
+                if expire_seconds:
+                    return await client.set(key, value, ex=expire_seconds)
+                else:
+                    return await client.set(key, value)
+        except Exception as e:
+            print(f"设置键值失败: {e}")
+            raise e
+    
+    async def delete(self, key):
+        """删除键"""
+        try:
+            client = await self.connect()
+            with instrumentation.track('redis', 'delete', key):
+                return await client.delete(key)
+        except Exception as e:
+            print(f"删除键失败: {e}")
+            raise e
+    
+    @asynccontextmanager
+    async def pipeline(self, flush_size=1000, transaction=False):
+        """
+        批量执行任意命令的管道，命令数达到 flush_size 时自动提交，退出时提交剩余命令
+        :param flush_size: 自动提交的命令数
+        :param transaction: 是否以 MULTI/EXEC 事务方式提交每一批
+        """
+        client = await self.connect()
+        pipe = AsyncRedisPipeline(client.pipeline(transaction=transaction), flush_size)
+        try:
+            yield pipe
+            await pipe.flush()
+        finally:
+            await pipe.reset()
+    
+    async def mget(self, keys, batch_size=1000, codec=None):
+        """
+        批量获取键值
+        :param keys: 键列表
+        :param batch_size: 单条 MGET 命令包含的键数，超出时分多条命令通过管道一次发送
+        :param codec: 值编码方式，默认使用 REDIS_CODEC
+        :return: 与 keys 顺序一致的值列表，不存在的键为 None
+        """
+        try:
+            keys = list(keys)
+            if not keys:
+                return []
+            codec = codec or self.codec
+            client = await self._get_client(codec)
+            with instrumentation.track('redis', 'mget', f"{len(keys)} keys") as op:
+                op.rows = len(keys)
+                if len(keys) <= batch_size:
+                    values = await client.mget(keys)
+                else:
+                    pipe = client.pipeline(transaction=False)
+                    for chunk in _chunked(keys, batch_size):
+                        pipe.mget(chunk)
+                    values = [value for values in await pipe.execute() for value in values]
+            if codec == 'text':
+                return values
+            return [unpack(value, codec) for value in values]
+        except Exception as e:
+            print(f"批量获取键值失败: {e}")
+            raise e
+    
+    async def mset(self, mapping, expire_seconds=None, batch_size=1000, codec=None):
+        """
+        批量设置键值
+        :param mapping: 键值字典
+        :param expire_seconds: 过期时间，可以是统一的秒数，也可以是 {键: 秒数} 字典
+        :param batch_size: 每批命令数
+        :param codec: 值编码方式，默认使用 REDIS_CODEC
+        """
+        try:
+            items = list(mapping.items())
+            if not items:
+                return True
+            codec = codec or self.codec
+            client = await self._get_client(codec)
+            if codec != 'text':
+                items = [(key, self._encode(value, codec)) for key, value in items]
+            with instrumentation.track('redis', 'mset', f"{len(items)} keys") as op:
+                op.rows = len(items)
+                pipe = client.pipeline(transaction=False)
+                if not expire_seconds:
+                    for chunk in _chunked(items, batch_size):
+                        pipe.mset(dict(chunk))
+                    await pipe.execute()
+                    return True
+                per_key = isinstance(expire_seconds, dict)
+                for chunk in _chunked(items, batch_size):
+                    for key, value in chunk:
+                        ttl = expire_seconds.get(key) if per_key else expire_seconds
+                        if ttl:
+                            pipe.set(key, value, ex=ttl)
+                        else:
+                            pipe.set(key, value)
+                    await pipe.execute()
+                return True
+        except Exception as e:
+            print(f"批量设置键值失败: {e}")
+            raise e
+    
+    async def delete_many(self, keys, batch_size=1000):
+        """
+        批量删除键
+        :param keys: 键列表
+        :param batch_size: 单条 DEL 命令包含的键数
+        :return: 删除的键数量
+        """
+        try:
+            keys = list(keys)
+            if not keys:
+                return 0
+            client = await self.connect()
+            with instrumentation.track('redis', 'delete_many', f"{len(keys)} keys") as op:
+                op.rows = len(keys)
+                pipe = client.pipeline(transaction=False)
+                for chunk in _chunked(keys, batch_size):
+                    pipe.delete(*chunk)
+                return sum(await pipe.execute())
+        except Exception as e:
+            print(f"批量删除键失败: {e}")
+            raise e
+    
+    async def scan_iter(self, pattern='*', count=1000, type_name=None):
+        """
+        使用 SCAN 游标遍历匹配的键（异步生成器），遍历期间键被修改时可能重复返回同一个键
+        :param pattern: 键匹配模式，如 'session:*'
+        :param count: 每次 SCAN 建议返回的键数
+        :param type_name: 仅返回该类型的键，如 'string'、'hash'（Redis 6+）
+        """
+        try:
+            client = await self.connect()
+            cursor = 0
+            while True:
+                with instrumentation.track('redis', 'scan', pattern) as op:
+                    cursor, keys = await client.scan(cursor, match=pattern, count=count, _type=type_name)
+                    op.rows = len(keys)
+                for key in keys:
+                    yield key
+                if not cursor:
+                    break
+        except Exception as e:
+            print(f"遍历键失败: {e}")
+            raise e
+    
+    async def scan_hash(self, key, pattern='*', count=1000):
+        """
+        使用 HSCAN 遍历哈希的字段（异步生成器）
+        :param key: 哈希键名
+        :param pattern: 字段匹配模式
+        :param count: 每次 HSCAN 建议返回的字段数
+        :return: 每次返回 (字段, 值)
+        """
+        try:
+            client = await self.connect()
+            cursor = 0
+            while True:
+                with instrumentation.track('redis', 'hscan', key) as op:
+                    cursor, fields = await client.hscan(key, cursor, match=pattern, count=count)
+                    op.rows = len(fields)
+                for item in fields.items():
+                    yield item
+                if not cursor:
+                    break
+        except Exception as e:
+            print(f"遍历哈希失败: {e}")
+            raise e
+    
+    async def scan_set(self, key, pattern='*', count=1000):
+        """
+        使用 SSCAN 遍历集合的成员（异步生成器）
+        :param key: 集合键名
+        :param pattern: 成员匹配模式
+        :param count: 每次 SSCAN 建议返回的成员数
+        """
+        try:
+            client = await self.connect()
+            cursor = 0
+            while True:
+                with instrumentation.track('redis', 'sscan', key) as op:
+                    cursor, members = await client.sscan(key, cursor, match=pattern, count=count)
+                    op.rows = len(members)
+                for member in members:
+                    yield member
+                if not cursor:
+                    break
+        except Exception as e:
+            print(f"遍历集合失败: {e}")
+            raise e
+    
+    async def _apply_pattern(self, operation, pattern, add_commands, batch_size, count, interval):
+        """按 SCAN 结果分批通过管道执行命令，返回各批结果之和"""
+        client = await self.connect()
+        total = 0
+        
+        async def flush(keys):
+            with instrumentation.track('redis', operation, pattern) as op:
+                op.rows = len(keys)
+                pipe = client.pipeline(transaction=False)
+                add_commands(pipe, keys)
+                return sum(await pipe.execute())
+        
+        batch = []
+        async for key in self.scan_iter(pattern, count):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                total += await flush(batch)
+                batch = []
+                # 批次之间让出 Redis，避免维护任务挤占正常请求
+                if interval:
+                    await asyncio.sleep(interval)
+        if batch:
+            total += await flush(batch)
+        return total
+    
+    async def delete_pattern(self, pattern, batch_size=500, count=1000, interval=0):
+        """
+        删除所有匹配的键：SCAN 遍历后分批 UNLINK
+        :param pattern: 键匹配模式，如 'session:*'
+        :param batch_size: 每批删除的键数
+        :param count: 每次 SCAN 建议返回的键数
+        :param interval: 批次之间的休眠秒数
+        :return: 删除的键数量
+        """
+        try:
+            return await self._apply_pattern('delete_pattern', pattern, lambda pipe, keys: pipe.unlink(*keys),
+                                             batch_size, count, interval)
+        except Exception as e:
+            print(f"按模式删除键失败: {e}")
+            raise e
+    
+    async def expire_pattern(self, pattern, expire_seconds, batch_size=500, count=1000, interval=0):
+        """
+        为所有匹配的键设置过期时间：SCAN 遍历后分批通过管道发送 EXPIRE
+        :param pattern: 键匹配模式，如 'session:*'
+        :param expire_seconds: 过期秒数
+        :param batch_size: 每批设置的键数
+        :param count: 每次 SCAN 建议返回的键数
+        :param interval: 批次之间的休眠秒数
+        :return: 设置成功的键数量
+        """
+        def add_commands(pipe, keys):
+            for key in keys:
+                pipe.expire(key, expire_seconds)
+        
+        try:
+            return await self._apply_pattern('expire_pattern', pattern, add_commands, batch_size, count, interval)
+        except Exception as e:
+            print(f"按模式设置过期时间失败: {e}")
+            raise e
+    
+    def pool_stats(self):
+        """获取连接池使用情况（已建立、空闲、使用中的连接数以及等待次数）"""
+        if not self._pool:
+            return None
+        stats = self._pool.stats()
+        if self._binary_pool:
+            stats['binary'] = self._binary_pool.stats()
+        return stats
+    
+    async def close(self):
+        """关闭 Redis 连接"""
+        if self._client:
+            await self._client.aclose()
+            await self._pool.disconnect()
+            self._client = None
+            self._pool = None
+            print("Redis 异步连接已关闭")
+        if self._binary_client:
+            await self._binary_client.aclose()
+            await self._binary_pool.disconnect()
+            self._binary_client = None
+            self._binary_pool = None
+
+# 创建单例实例
+async_redis_util = AsyncRedisUtil()
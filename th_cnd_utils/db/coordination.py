@@ -0,0 +1,277 @@
+import time
+import uuid
+import threading
+from .redis import redis_util
+from ..instrumentation import instrumentation
+
+# 仅当锁仍由自己持有时才删除
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# 仅当锁仍由自己持有时才延长过期时间
+_EXTEND_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# 滑动窗口：有序集合记录窗口内每次请求的时间，返回 {是否允许, 需要等待的毫秒数}
+_SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[1])
+if count + cost <= limit then
+    for i = 1, cost do
+        redis.call('ZADD', KEYS[1], now, ARGV[4] .. ':' .. i)
+    end
+    redis.call('PEXPIRE', KEYS[1], window)
+    return {1, 0}
+end
+local oldest = redis.call('ZRANGE', KEYS[1], count + cost - limit - 1, count + cost - limit - 1, 'WITHSCORES')
+return {0, tonumber(oldest[2]) + window - now}
+"""
+
+# 令牌桶：哈希记录剩余令牌数和上次更新时间，返回 {是否允许, 需要等待的毫秒数}
+_TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + tonumber(time[2]) / 1000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = math.ceil((cost - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate) + 1000)
+return {allowed, retry_after}
+"""
+
+_scripts = {}
+
+def _run_script(client, source, keys, args):
+    """执行 Lua 脚本，优先使用 EVALSHA，服务端未缓存时自动改用 EVAL"""
+    script = _scripts.get(source)
+    if script is None:
+        script = _scripts[source] = client.register_script(source)
+    return script(keys=keys, args=args, client=client)
+
+class RedisLock:
+    """
+    基于 Redis 的分布式锁
+    - 使用 SET NX PX 加锁，值为随机令牌，释放和续期时用 Lua 脚本校验令牌，不会误删他人的锁
+    - auto_renew=True 时后台线程每隔 timeout/3 续期一次，持锁时间可以超过 timeout
+    """
+    
+    def __init__(self, name, timeout=30, auto_renew=True, blocking_timeout=None, retry_interval=0.1,
+                 key_prefix='th_cnd_utils:lock'):
+        """
+        :param name: 锁名称
+        :param timeout: 锁的过期时间（秒），持有者崩溃后最多经过该时间锁自动释放
+        :param auto_renew: 是否在持锁期间自动续期
+        :param blocking_timeout: 获取锁的最长等待时间（秒），None 表示一直等待
+        :param retry_interval: 获取锁失败后的重试间隔（秒）
+        :param key_prefix: Redis 键前缀
+        """
+        self.name = name
+        self.key = f"{key_prefix}:{name}"
+        self.timeout = timeout
+        self.auto_renew = auto_renew
+        self.blocking_timeout = blocking_timeout
+        self.retry_interval = retry_interval
+        self.token = None
+        # 续期失败（锁已过期或被他人获取）时置位
+        self.lost = threading.Event()
+        self._stop_renew = threading.Event()
+        self._renew_thread = None
+    
+    def acquire(self, blocking=True, blocking_timeout=None):
+        """
+        获取锁
+        :param blocking: 获取失败时是否等待重试
+        :param blocking_timeout: 本次获取的最长等待时间（秒），默认使用实例的 blocking_timeout
+        :return: 是否获取成功
+        """
+        try:
+            client = redis_util.connect()
+            token = uuid.uuid4().hex
+            blocking_timeout = self.blocking_timeout if blocking_timeout is None else blocking_timeout
+            deadline = None if blocking_timeout is None else time.monotonic() + blocking_timeout
+            with instrumentation.track('redis', 'lock_acquire', self.key):
+                while True:
+                    if client.set(self.key, token, nx=True, px=int(self.timeout * 1000)):
+                        break
+                    if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                        return False
+                    time.sleep(self.retry_interval)
+            self.token = token
+            self.lost.clear()
+            if self.auto_renew:
+                self._start_renew()
+            return True
+        except Exception as e:
+            print(f"获取锁失败: {e}")
+            raise e
+    
+    def extend(self, timeout=None):
+        """
+        将锁的过期时间重置为 timeout 秒
+        :return: 锁是否仍由自己持有
+        """
+        if self.token is None:
+            return False
+        timeout = self.timeout if timeout is None else timeout
+        return bool(_run_script(redis_util.connect(), _EXTEND_SCRIPT, [self.key], [self.token, int(timeout * 1000)]))
+    
+    def release(self):
+        """
+        释放锁
+        :return: 释放前锁是否仍由自己持有
+        """
+        try:
+            self._stop_renew_thread()
+            if self.token is None:
+                return False
+            client = redis_util.connect()
+            with instrumentation.track('redis', 'lock_release', self.key):
+                released = bool(_run_script(client, _RELEASE_SCRIPT, [self.key], [self.token]))
+            self.token = None
+            return released
+        except Exception as e:
+            print(f"释放锁失败: {e}")
+            raise e
+    
+    def owned(self):
+        """锁是否仍由自己持有"""
+        if self.token is None:
+            return False
+        return redis_util.connect().get(self.key) == self.token
+    
+    def _start_renew(self):
+        self._stop_renew.clear()
+        self._renew_thread = threading.Thread(target=self._renew, args=(self.token,),
+                                              name=f'redis-lock-{self.name}', daemon=True)
+        self._renew_thread.start()
+    
+    def _stop_renew_thread(self):
+        self._stop_renew.set()
+        if self._renew_thread is not None and self._renew_thread is not threading.current_thread():
+            self._renew_thread.join()
+        self._renew_thread = None
+    
+    def _renew(self, token):
+        """续期线程"""
+        interval = self.timeout / 3
+        while not self._stop_renew.wait(interval):
+            try:
+                if self.token != token or not self.extend():
+                    print(f"锁已丢失: {self.name}")
+                    self.lost.set()
+                    return
+            except Exception as e:
+                # 临时的连接错误不立即判定丢锁，下一轮继续尝试
+                print(f"锁续期失败: {e}")
+    
+    def __enter__(self):
+        if not self.acquire():
+            raise TimeoutError(f"获取锁超时: {self.name}")
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+class RateLimiter:
+    """
+    基于 Redis 的分布式限流器，每次检查只执行一个 Lua 脚本（一次网络往返），多进程共享同一限额
+    - algorithm='sliding_window'：任意 period 秒内最多 limit 次
+    - algorithm='token_bucket'：平均每 period 秒 limit 次，允许最多 burst 次的突发
+    """
+    
+    def __init__(self, name, limit, period=1, algorithm='sliding_window', burst=None,
+                 key_prefix='th_cnd_utils:rate'):
+        """
+        :param name: 限流器名称
+        :param limit: 每个周期允许的次数
+        :param period: 周期（秒）
+        :param algorithm: 'sliding_window' 或 'token_bucket'
+        :param burst: 令牌桶容量，默认等于 limit
+        :param key_prefix: Redis 键前缀
+        """
+        if algorithm not in ('sliding_window', 'token_bucket'):
+            raise ValueError(f"不支持的限流算法: {algorithm}")
+        self.name = name
+        self.limit = limit
+        self.period = period
+        self.algorithm = algorithm
+        self.burst = burst or limit
+        self.key_prefix = f"{key_prefix}:{name}"
+    
+    def _key(self, key):
+        return f"{self.key_prefix}:{key}" if key else self.key_prefix
+    
+    def check(self, key=None, cost=1):
+        """
+        尝试消耗 cost 次配额
+        :param key: 细分的限流对象，如用户 ID、接口名，None 表示整个限流器共享配额
+        :param cost: 本次消耗的次数
+        :return: (是否允许, 需要等待的秒数)
+        """
+        capacity = self.limit if self.algorithm == 'sliding_window' else self.burst
+        if cost > capacity:
+            raise ValueError(f"单次消耗 {cost} 超过限流上限 {capacity}")
+        try:
+            client = redis_util.connect()
+            redis_key = self._key(key)
+            with instrumentation.track('redis', 'rate_limit', redis_key):
+                if self.algorithm == 'sliding_window':
+                    allowed, retry_after = _run_script(client, _SLIDING_WINDOW_SCRIPT, [redis_key],
+                                                       [self.limit, int(self.period * 1000), cost, uuid.uuid4().hex])
+                else:
+                    allowed, retry_after = _run_script(client, _TOKEN_BUCKET_SCRIPT, [redis_key],
+                                                       [self.burst, self.limit / (self.period * 1000), cost])
+            return bool(allowed), max(int(retry_after), 0) / 1000
+        except Exception as e:
+            print(f"限流检查失败: {e}")
+            raise e
+    
+    def try_acquire(self, key=None, cost=1):
+        """尝试消耗配额，不等待"""
+        return self.check(key, cost)[0]
+    
+    def acquire(self, key=None, cost=1, timeout=None):
+        """
+        消耗配额，配额不足时按脚本返回的等待时间休眠后重试
+        :param timeout: 最长等待时间（秒），None 表示一直等待
+        :return: 是否在超时前获得配额
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            allowed, retry_after = self.check(key, cost)
+            if allowed:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or retry_after > remaining:
+                    return False
+            time.sleep(max(retry_after, 0.001))
+    
+    def reset(self, key=None):
+        """清空配额记录"""
+        return redis_util.delete(self._key(key))
@@ -1,13 +1,186 @@
 import pymysql
+from pymysql.constants import SERVER_STATUS
 import os
+import time
+import itertools
+import threading
+from collections import deque
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from ..config import config
+from .query_cache import QueryCache
+from ..instrumentation import instrumentation
 
 # 加载环境变量
 load_dotenv()
 
+def _chunked(iterable, size):
+    """按固定大小切分可迭代对象"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _quote_identifier(name):
+    """为表名/列名加反引号"""
+    return '`' + str(name).replace('`', '``') + '`'
+
+class MySQLConnectionPool:
+    """线程安全的 MySQL 连接池"""
+    
+    def __init__(self, connect_kwargs, min_size=1, max_size=10, timeout=10, recycle=3600, ping_interval=30):
+        """
+        :param connect_kwargs: pymysql.connect 的参数
+        :param min_size: 最小连接数（预先建立）
+        :param max_size: 最大连接数
+        :param timeout: 获取连接的等待超时时间（秒）
+        :param recycle: 连接空闲超过该秒数后在下次取出时重建，0 表示不回收
+        :param ping_interval: 连接空闲超过该秒数后在下次取出时先 ping 检测，0 表示每次取出都检测
+        """
+        self._connect_kwargs = connect_kwargs
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+        self._idle = deque()  # (connection, last_used)
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+    
+    def _create_connection(self):
+        """创建一个新的物理连接"""
+        return pymysql.connect(**self._connect_kwargs)
+    
+    def fill(self):
+        """预先建立 min_size 个连接"""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                connection = self._create_connection()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            self.release(connection)
+    
+    def acquire(self, timeout=None):
+        """从连接池中取出一个可用连接"""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("MySQL 连接池已关闭")
+                if self._idle:
+                    connection, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    connection, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"获取 MySQL 连接超时（{timeout} 秒）")
+                self._cond.wait(remaining)
+        
+        # 建立连接和存活检测都在锁外进行，避免阻塞其他线程
+        try:
+            if connection is not None:
+                idle_seconds = time.monotonic() - last_used
+                if self.recycle and idle_seconds > self.recycle:
+                    self._close_quietly(connection)
+                    connection = None
+                elif idle_seconds >= self.ping_interval:
+                    # 刚归还的连接不检测，省去每次借出时的一次往返
+                    try:
+                        connection.ping(reconnect=True)
+                    except Exception:
+                        self._close_quietly(connection)
+                        connection = None
+            if connection is None:
+                connection = self._create_connection()
+            return connection
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+    
+    def release(self, connection, discard=False):
+        """
+        将连接归还到连接池，discard 为 True 时直接关闭该连接
+        归还前回滚未结束的显式事务，避免下一个使用者提交上一个使用者未提交的语句；
+        连接为自动提交模式，普通语句执行后没有未结束的事务，不需要额外的往返
+        """
+        if not discard and not self._closed and connection.open and self._in_transaction(connection):
+            try:
+                connection.rollback()
+            except Exception:
+                discard = True
+        with self._cond:
+            if discard or self._closed or not connection.open:
+                self._size -= 1
+                self._cond.notify()
+                close_connection = True
+            else:
+                self._idle.append((connection, time.monotonic()))
+                self._cond.notify()
+                close_connection = False
+        if close_connection:
+            self._close_quietly(connection)
+    
+    def close(self):
+        """关闭连接池中的所有空闲连接，使用中的连接归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle = [connection for connection, _ in self._idle]
+            self._size -= len(idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for connection in idle:
+            self._close_quietly(connection)
+    
+    def stats(self):
+        """连接池使用情况"""
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                'size': self._size,
+                'idle': idle,
+                'in_use': self._size - idle,
+                'max_size': self.max_size
+            }
+    
+    @staticmethod
+    def _in_transaction(connection):
+        """根据最近一次响应的服务端状态判断连接上是否有未结束的事务，状态未知时按有事务处理"""
+        server_status = getattr(connection, 'server_status', None)
+        if server_status is None:
+            return True
+        return bool(server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS)
+    
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
 class MySQLUtil:
     _instance = None
-    _connection = None
+    _pool = None
+    _replica_pools = ()
+    _query_cache = None
+    _pool_lock = threading.Lock()
     
     def __new__(cls):
         if cls._instance is None:
@@ -22,56 +195,421 @@ class MySQLUtil:
             self.user = os.getenv('MYSQL_USER', 'root')
             self.password = os.getenv('MYSQL_PASSWORD', '')
             self.database = os.getenv('MYSQL_DATABASE', 'test')
+            self.pool_min_size = config['mysql']['pool_min_size']
+            self.pool_max_size = config['mysql']['pool_max_size']
+            self.pool_timeout = config['mysql']['pool_timeout']
+            self.pool_recycle = config['mysql']['pool_recycle']
+            self.pool_ping_interval = config['mysql']['pool_ping_interval']
+            # 读写分离配置
+            self.replicas = []
+            for item in config['mysql']['replica_hosts']:
+                host, _, port = item.partition(':')
+                self.replicas.append((host, int(port) if port else self.port))
+            self.read_strategy = config['mysql']['read_strategy']
+            self.sticky_seconds = config['mysql']['sticky_seconds']
+            self.replica_connect_timeout = config['mysql']['replica_connect_timeout']
+            self.replica_cooldown = config['mysql']['replica_cooldown']
+            self._local = threading.local()
+            self._round_robin = itertools.count()
+            # 从库连接池 -> 连接失败后恢复使用的时间
+            self._replica_retry_at = {}
+    
+    def _create_pool(self, host, port, min_size, connect_timeout=None):
+        """
+        创建指定主机的连接池
+        :param connect_timeout: 连接超时（秒），默认使用 pymysql 的 10 秒
+        """
+        connect_kwargs = {
+            'host': host,
+            'port': port,
+            'user': self.user,
+            'password': self.password,
+            'database': self.database,
+            'charset': 'utf8mb4',
+            'cursorclass': pymysql.cursors.DictCursor,
+            # 单条语句自动提交，需要多条语句原子执行时使用 transaction()
+            'autocommit': True
+        }
+        if connect_timeout:
+            connect_kwargs['connect_timeout'] = connect_timeout
+        return MySQLConnectionPool(
+            connect_kwargs,
+            min_size=min_size,
+            max_size=self.pool_max_size,
+            timeout=self.pool_timeout,
+            recycle=self.pool_recycle,
+            ping_interval=self.pool_ping_interval
+        )
     
     def connect(self):
-        """建立数据库连接"""
+        """建立数据库连接池（主库，以及配置的从库）"""
         try:
-            if not self._connection or not self._connection.open:
-                self._connection = pymysql.connect(
-                    host=self.host,
-                    port=self.port,
-                    user=self.user,
-                    password=self.password,
-                    database=self.database,
-                    charset='utf8mb4',
-                    cursorclass=pymysql.cursors.DictCursor
-                )
-                print("MySQL 连接成功")
-            return self._connection
+            if not self._pool:
+                with self._pool_lock:
+                    if not self._pool:
+                        pool = self._create_pool(self.host, self.port, self.pool_min_size)
+                        pool.fill()
+                        # 从库连接池按需建立连接，使用较短的连接超时，从库不可用时不影响主库
+                        self._replica_pools = [
+                            self._create_pool(host, port, 0, self.replica_connect_timeout)
+                            for host, port in self.replicas
+                        ]
+                        self._replica_retry_at = {}
+                        self._pool = pool
+                        print("MySQL 连接成功")
+            return self._pool
         except Exception as e:
             print(f"MySQL 连接失败: {e}")
             raise e
     
-    def execute_query(self, sql, params=None):
-        """执行查询语句"""
+    def _in_sticky_window(self):
+        """当前线程最近是否写过主库（读己之写）"""
+        last_write = getattr(self._local, 'last_write', None)
+        return last_write is not None and time.monotonic() - last_write < self.sticky_seconds
+    
+    def _choose_replica(self):
+        """按读策略选择从库连接池，跳过连接失败后仍在暂停期内的从库，没有可用从库时返回 None"""
+        now = time.monotonic()
+        replicas = [pool for pool in self._replica_pools if self._replica_retry_at.get(pool, 0) <= now]
+        if not replicas:
+            return None
+        if self.read_strategy == 'least_outstanding':
+            return min(replicas, key=lambda pool: pool.stats()['in_use'])
+        return replicas[next(self._round_robin) % len(replicas)]
+    
+    def _acquire(self, read_only=False):
+        """借出连接，返回 (连接池, 连接)；只读请求优先路由到从库，失败时回退主库"""
+        pool = self.connect()
+        replica = None
+        if read_only and self._replica_pools and not self._in_sticky_window():
+            replica = self._choose_replica()
+        if replica is not None:
+            try:
+                return replica, replica.acquire()
+            except TimeoutError as e:
+                # 从库连接池已满，从库本身可用
+                print(f"MySQL 从库连接池繁忙，回退到主库: {e}")
+            except Exception as e:
+                # 连接失败的从库在暂停期内不再使用，避免每次读请求都等待连接超时
+                self._replica_retry_at[replica] = time.monotonic() + self.replica_cooldown
+                print(f"MySQL 从库连接失败，{self.replica_cooldown} 秒内回退到主库: {e}")
+        return pool, pool.acquire()
+    
+    @contextmanager
+    def connection(self, read_only=False):
+        """
+        从连接池借出一个连接，退出时自动归还；发生异常时回滚
+        连接为自动提交模式，每条语句单独提交，多条语句需要原子执行时调用 connection.begin() 或使用 transaction()
+        :param read_only: True 时优先使用从库；否则使用主库，并在退出后的一段时间内
+                          将当前线程的读请求也固定到主库（读己之写）
+        """
+        with self._checkout(read_only, record_write=not read_only) as connection:
+            yield connection
+    
+    @contextmanager
+    def _checkout(self, read_only, record_write):
+        """借出连接，record_write 为 True 时记录当前线程的写入时间"""
+        pool, connection = self._acquire(read_only)
+        discard = False
+        try:
+            yield connection
+        except Exception:
+            try:
+                connection.rollback()
+            except Exception:
+                discard = True
+            raise
+        finally:
+            if record_write:
+                self._local.last_write = time.monotonic()
+            pool.release(connection, discard=discard)
+    
+    @contextmanager
+    def transaction(self):
+        """在主库上开启显式事务，正常退出时提交，异常时回滚"""
+        with self.connection() as connection:
+            connection.begin()
+            yield connection
+            connection.commit()
+    
+    def execute_query(self, sql, params=None, use_primary=False, cache_ttl=None):
+        """
+        执行查询语句，配置了从库时默认路由到从库
+        :param use_primary: True 时强制读主库
+        :param cache_ttl: 结果缓存秒数，需先调用 enable_query_cache，缓存结果为共享对象，请勿修改
+        """
         try:
-            connection = self.connect()
-            with connection.cursor() as cursor:
-                cursor.execute(sql, params)
-                result = cursor.fetchall()
-                return result
+            cache = self._query_cache if cache_ttl else None
+            if cache:
+                found, result, slot = cache.get(sql, params)
+                if found:
+                    return result
+            with instrumentation.track('mysql', 'query', sql) as op:
+                # 强制读主库不是写入，不影响当前线程后续读请求的路由
+                with self._checkout(read_only=not use_primary, record_write=False) as connection:
+                    with connection.cursor() as cursor:
+                        cursor.execute(sql, params)
+                        result = cursor.fetchall()
+                op.rows = len(result)
+            if cache:
+                cache.set(slot, result, cache_ttl)
+            return result
         except Exception as e:
             print(f"查询执行失败: {e}")
             raise e
     
+    def iter_query(self, sql, params=None, chunk_size=1000, as_dict=True, yield_chunks=False):
+        """
+        使用服务端游标流式读取查询结果，不会一次性载入内存
+        :param sql: 查询语句
+        :param params: 查询参数
+        :param chunk_size: 每次从服务端读取的行数
+        :param as_dict: True 返回字典行，False 返回元组行（更省内存）
+        :param yield_chunks: True 时按块返回行列表，否则逐行返回
+        """
+        cursor_class = pymysql.cursors.SSDictCursor if as_dict else pymysql.cursors.SSCursor
+        pool, connection = self._acquire(read_only=True)
+        # 未读完的流式结果会占住连接，提前中止时直接丢弃该连接
+        discard = True
+        # 耗时统计覆盖整个流式读取过程
+        start = time.perf_counter()
+        row_count = 0
+        error = None
+        try:
+            cursor = connection.cursor(cursor_class)
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                row_count += len(rows)
+                if yield_chunks:
+                    yield rows
+                else:
+                    yield from rows
+            cursor.close()
+            discard = False
+        except Exception as e:
+            error = e
+            print(f"流式查询失败: {e}")
+            raise e
+        finally:
+            pool.release(connection, discard=discard)
+            if instrumentation.enabled:
+                instrumentation.observe('mysql', 'iter_query', time.perf_counter() - start,
+                                        rows=row_count, error=error, statement=sql)
+    
+    def scan_table(self, table, key_column, batch_size=1000, where=None, params=None,
+                   start_after=None, columns='*'):
+        """
+        按主键范围（keyset 分页）遍历整张表，每页耗时与页码无关
+        :param table: 表名
+        :param key_column: 唯一且有索引的排序列，通常为主键
+        :param batch_size: 每批行数
+        :param where: 额外的过滤条件（不含 WHERE 关键字），如 'status = %s'
+        :param params: where 条件的参数，可以是序列（%s 占位符）或字典（%(name)s 占位符）
+        :param start_after: 从该键值之后开始遍历，用于断点续跑
+        :param columns: 查询列，默认全部列；结果中总是包含 key_column
+        :return: 生成器，每次返回一批行（字典列表），最后一行的 key_column 即续跑位置
+        """
+        key = _quote_identifier(key_column)
+        # 单独查询排序列，columns 中不含 key_column 时也能取得续跑位置
+        base_sql = f"SELECT {key} AS {key}, {columns} FROM {_quote_identifier(table)} WHERE "
+        conditions = [f"({where})"] if where else []
+        named = isinstance(params, dict)
+        last_key = start_after
+        while True:
+            page_conditions = list(conditions)
+            if named:
+                page_params = dict(params)
+                if last_key is not None:
+                    page_conditions.append(f"{key} > %(_scan_last_key)s")
+                    page_params['_scan_last_key'] = last_key
+                limit = '%(_scan_limit)s'
+                page_params['_scan_limit'] = batch_size
+            else:
+                page_params = list(params or [])
+                if last_key is not None:
+                    page_conditions.append(f"{key} > %s")
+                    page_params.append(last_key)
+                limit = '%s'
+                page_params.append(batch_size)
+            sql = base_sql + (' AND '.join(page_conditions) or '1 = 1') + f" ORDER BY {key} LIMIT {limit}"
+            rows = self.execute_query(sql, page_params)
+            if not rows:
+                return
+            yield rows
+            if len(rows) < batch_size:
+                return
+            last_key = rows[-1][key_column]
+    
     def execute_update(self, sql, params=None):
         """执行更新语句（INSERT, UPDATE, DELETE）"""
         try:
-            connection = self.connect()
-            with connection.cursor() as cursor:
-                result = cursor.execute(sql, params)
-                connection.commit()
-                return result
+            with instrumentation.track('mysql', 'update', sql) as op:
+                with self.connection() as connection:
+                    with connection.cursor() as cursor:
+                        result = cursor.execute(sql, params)
+                op.rows = result
+            self._invalidate_sql(sql)
+            return result
         except Exception as e:
             print(f"更新执行失败: {e}")
-            connection.rollback()
             raise e
     
+    def execute_many(self, sql, rows, batch_size=1000):
+        """
+        批量执行同一条语句，每批在一个事务中执行并提交
+        :param sql: SQL 语句，INSERT/REPLACE 会被 pymysql 自动改写为多行 VALUES
+        :param rows: 参数序列（可以是生成器）
+        :param batch_size: 每批的行数
+        :return: 影响的总行数
+        """
+        try:
+            affected = 0
+            committed = False
+            try:
+                with instrumentation.track('mysql', 'execute_many', sql) as op:
+                    with self.connection() as connection:
+                        with connection.cursor() as cursor:
+                            for batch in _chunked(rows, batch_size):
+                                # 非 INSERT/REPLACE 语句会逐行执行，显式事务保证整批一起提交
+                                connection.begin()
+                                affected += cursor.executemany(sql, batch) or 0
+                                connection.commit()
+                                committed = True
+                    op.rows = affected
+            finally:
+                # 后续批次失败时，已提交的批次仍然需要使缓存失效
+                if committed:
+                    self._invalidate_sql(sql)
+            return affected
+        except Exception as e:
+            print(f"批量执行失败: {e}")
+            raise e
+    
+    def bulk_insert(self, table, rows, on_duplicate=None, batch_size=1000, max_packet_bytes=None):
+        """
+        使用多行 INSERT 批量插入数据，每批提交一次
+        :param table: 表名
+        :param rows: 字典序列，列名取自第一行
+        :param on_duplicate: 主键冲突处理方式：None（报错）、'ignore'、'update'（更新全部列）
+                             或需要更新的列名列表
+        :param batch_size: 每条语句最多包含的行数
+        :param max_packet_bytes: 单条语句的最大字节数，默认取服务端 max_allowed_packet 的 90%
+        :return: 影响的总行数
+        """
+        try:
+            rows = iter(rows)
+            first = next(rows, None)
+            if first is None:
+                return 0
+            columns = list(first.keys())
+            
+            if on_duplicate == 'ignore':
+                prefix = 'INSERT IGNORE INTO'
+            else:
+                prefix = 'INSERT INTO'
+            head = f"{prefix} {_quote_identifier(table)} ({', '.join(_quote_identifier(c) for c in columns)}) VALUES "
+            
+            tail = ''
+            if on_duplicate and on_duplicate != 'ignore':
+                update_columns = columns if on_duplicate == 'update' else list(on_duplicate)
+                tail = ' ON DUPLICATE KEY UPDATE ' + ', '.join(
+                    f"{_quote_identifier(c)} = VALUES({_quote_identifier(c)})" for c in update_columns
+                )
+            
+            affected = 0
+            committed = False
+            try:
+                with instrumentation.track('mysql', 'bulk_insert', head) as op:
+                    with self.connection() as connection:
+                        if max_packet_bytes is None:
+                            with connection.cursor() as cursor:
+                                cursor.execute('SELECT @@max_allowed_packet AS max_allowed_packet')
+                                max_packet_bytes = int(cursor.fetchone()['max_allowed_packet'] * 0.9)
+                        base_size = len(head.encode('utf-8')) + len(tail.encode('utf-8'))
+                        
+                        def flush(values):
+                            nonlocal committed
+                            sql = head + ','.join(values) + tail
+                            # 每批是一条多行 INSERT 语句，自动提交
+                            with connection.cursor() as cursor:
+                                result = cursor.execute(sql)
+                            committed = True
+                            return result
+                        
+                        values = []
+                        size = base_size
+                        for row in itertools.chain([first], rows):
+                            value = connection.escape(tuple(row[c] for c in columns))
+                            value_size = len(value.encode('utf-8')) + 1
+                            if values and (len(values) >= batch_size or size + value_size > max_packet_bytes):
+                                affected += flush(values)
+                                values = []
+                                size = base_size
+                            values.append(value)
+                            size += value_size
+                        if values:
+                            affected += flush(values)
+                    op.rows = affected
+            finally:
+                # 后续批次失败时，已提交的批次仍然需要使缓存失效
+                if committed:
+                    self.invalidate_tables(table)
+            return affected
+        except Exception as e:
+            print(f"批量插入失败: {e}")
+            raise e
+    
+    def enable_query_cache(self, max_size=1024, backend='local', codec=None):
+        """
+        开启查询结果缓存，execute_query 传入 cache_ttl 时生效
+        :param max_size: 进程内缓存的最大条目数
+        :param backend: 'local'（进程内 LRU）或 'redis'（通过 redis_util 跨进程共享）
+        :param codec: redis 后端的编码方式，默认使用 REDIS_CACHE_CODEC（json），pickle 需要显式指定
+        """
+        self._query_cache = QueryCache(max_size=max_size, backend=backend, codec=codec)
+        return self._query_cache
+    
+    def disable_query_cache(self):
+        """关闭查询结果缓存"""
+        self._query_cache = None
+    
+    def invalidate_tables(self, *tables):
+        """使引用了指定表的查询缓存失效，用于 connection()/transaction() 中手动执行的写操作"""
+        if self._query_cache:
+            self._query_cache.invalidate_tables(tables)
+    
+    def _invalidate_sql(self, sql):
+        if self._query_cache:
+            self._query_cache.invalidate_sql(sql)
+    
+    def query_cache_stats(self):
+        """获取查询缓存命中统计"""
+        if not self._query_cache:
+            return None
+        return self._query_cache.stats()
+    
+    def pool_stats(self):
+        """获取连接池使用情况"""
+        if not self._pool:
+            return None
+        stats = self._pool.stats()
+        if self._replica_pools:
+            stats['replicas'] = [pool.stats() for pool in self._replica_pools]
+        return stats
+    
     def close(self):
         """关闭数据库连接"""
-        if self._connection and self._connection.open:
-            self._connection.close()
-            print("MySQL 连接已关闭")
+        with self._pool_lock:
+            if self._pool:
+                self._pool.close()
+                for pool in self._replica_pools:
+                    pool.close()
+                self._pool = None
+                self._replica_pools = ()
+                print("MySQL 连接已关闭")
 
 # 创建单例实例
 mysql_util = MySQLUtil()
\ No newline at end of file
@@ -0,0 +1,195 @@
+import time
+import threading
+from collections import OrderedDict
+import redis
+
+# 服务端推送失效消息的频道
+INVALIDATE_CHANNEL = '__redis__:invalidate'
+
+class RedisNearCache:
+    """
+    基于 Redis 服务端协助的客户端缓存（CLIENT TRACKING）
+    读连接开启 CLIENT TRACKING 并把失效消息重定向到专用的监听连接，
+    被读取过的键在服务端发生修改时，监听线程收到推送并删除本地副本。
+    """
+    
+    def __init__(self, connection_kwargs, max_size=10000, prefixes=None, create_client=None):
+        """
+        :param connection_kwargs: redis.Connection 的连接参数
+        :param max_size: 本地缓存的最大条目数
+        :param prefixes: 仅缓存这些前缀的键，并使用 BCAST 模式按前缀订阅失效消息
+        :param create_client: 创建读连接客户端的函数，参数为新连接建立后需要执行的函数，返回 (连接池, 客户端)；
+                              默认使用 connection_kwargs 创建连接用尽时阻塞等待的连接池
+        """
+        self._connection_kwargs = dict(connection_kwargs)
+        self.max_size = max_size
+        self.prefixes = tuple(prefixes or ())
+        self._create_client = create_client or self._default_client
+        self._entries = OrderedDict()
+        # 读取中的键：读取期间收到失效消息时，结果不写入本地缓存
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._listener = None
+        self._listener_id = None
+        self._healthy = threading.Event()
+        self._closed = False
+        self._thread = None
+        self._client = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.flushes = 0
+    
+    def start(self):
+        """建立监听连接和读连接"""
+        self._connect_listener()
+        _, self._client = self._create_client(self._on_connect)
+        self._healthy.set()
+        self._thread = threading.Thread(target=self._listen, name='redis-near-cache', daemon=True)
+        self._thread.start()
+    
+    def _default_client(self, on_connect):
+        pool = redis.BlockingConnectionPool(redis_connect_func=on_connect, **self._connection_kwargs)
+        return pool, redis.Redis(connection_pool=pool)
+    
+    def _connect_listener(self):
+        """建立专用监听连接，记录其连接 ID 并订阅失效频道"""
+        kwargs = dict(self._connection_kwargs)
+        # 监听连接需要长时间阻塞读取
+        kwargs['socket_timeout'] = None
+        listener = redis.Connection(**kwargs)
+        listener.connect()
+        listener.send_command('CLIENT', 'ID')
+        self._listener_id = listener.read_response()
+        listener.send_command('SUBSCRIBE', INVALIDATE_CHANNEL)
+        listener.read_response()
+        self._listener = listener
+    
+    def _on_connect(self, connection):
+        """读连接建立后开启 CLIENT TRACKING，失效消息重定向到监听连接"""
+        connection.on_connect()
+        args = ['CLIENT', 'TRACKING', 'ON', 'REDIRECT', self._listener_id]
+        if self.prefixes:
+            args.append('BCAST')
+            for prefix in self.prefixes:
+                args.extend(['PREFIX', prefix])
+        connection.send_command(*args)
+        connection.read_response()
+    
+    def _listen(self):
+        """监听线程：处理失效消息，连接断开时清空本地缓存并重连"""
+        backoff = 0.1
+        while not self._closed:
+            try:
+                if self._listener is None:
+                    self._connect_listener()
+                    # 监听连接 ID 已变化，读连接需要重新建立以更新 REDIRECT 目标
+                    self._client.connection_pool.disconnect()
+                    self._healthy.set()
+                    backoff = 0.1
+                if not self._listener.can_read(timeout=1):
+                    continue
+                message = self._listener.read_response()
+                if isinstance(message, list) and len(message) == 3 and message[0] in ('message', b'message'):
+                    self._invalidate_keys(message[2])
+            except Exception as e:
+                if self._closed:
+                    break
+                print(f"Redis 客户端缓存失效监听中断: {e}")
+                # 失效消息可能已丢失，本地缓存不再可信
+                self._healthy.clear()
+                self.flush()
+                if self._listener is not None:
+                    try:
+                        self._listener.disconnect()
+                    except Exception:
+                        pass
+                    self._listener = None
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 5)
+    
+    def _invalidate_keys(self, keys):
+        """处理失效消息，keys 为 None 表示需要清空全部缓存（如 FLUSHALL）"""
+        if keys is None:
+            self.flush()
+            return
+        with self._lock:
+            for key in keys:
+                if isinstance(key, bytes):
+                    key = key.decode('utf-8')
+                self._entries.pop(key, None)
+                self._pending.pop(key, None)
+            self.invalidations += len(keys)
+    
+    def matches(self, key):
+        """键是否使用本地缓存"""
+        return not self.prefixes or key.startswith(self.prefixes)
+    
+    def get(self, key):
+        """优先从本地缓存读取，未命中时从 Redis 读取并缓存"""
+        token = object()
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+            if self._healthy.is_set():
+                self._pending[key] = token
+        try:
+            value = self._client.get(key)
+        except Exception:
+            with self._lock:
+                if self._pending.get(key) is token:
+                    del self._pending[key]
+            raise
+        with self._lock:
+            if self._pending.get(key) is token:
+                del self._pending[key]
+                self._entries[key] = value
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return value
+    
+    def invalidate(self, keys):
+        """本进程写入后立即删除本地副本，不等待服务端推送"""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                self._pending.pop(key, None)
+    
+    def flush(self):
+        """清空本地缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+            self.flushes += 1
+    
+    def stats(self):
+        """本地缓存命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'invalidations': self.invalidations,
+                'flushes': self.flushes,
+                'healthy': self._healthy.is_set()
+            }
+    
+    def close(self):
+        """停止监听并关闭连接"""
+        self._closed = True
+        self._healthy.clear()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        if self._listener is not None:
+            self._listener.disconnect()
+            self._listener = None
+        if self._client is not None:
+            self._client.close()
+            self._client.connection_pool.disconnect()
+        self.flush()
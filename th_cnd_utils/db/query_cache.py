@@ -0,0 +1,378 @@
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from ..config import config
+from ..serialization import unpack
+
+# 表名：可带库名和反引号
+_IDENTIFIER = r'(?:`[^`]+`|\w+)(?:\s*\.\s*(?:`[^`]+`|\w+))?'
+_TABLE_PATTERN = re.compile(r'\s*(' + _IDENTIFIER + r')(?:\.\*)?', re.IGNORECASE)
+# 表名后的分区、别名和索引提示
+_PARTITION_PATTERN = re.compile(r'\s+PARTITION\s*\([^)]*\)', re.IGNORECASE)
+_ALIAS_PATTERN = re.compile(r'\s+(?:AS\s+)?(`[^`]+`|\w+)', re.IGNORECASE)
+_INDEX_HINT_PATTERN = re.compile(
+    r'\s+(?:USE|IGNORE|FORCE)\s+(?:INDEX|KEY)(?:\s+FOR\s+(?:JOIN|ORDER\s+BY|GROUP\s+BY))?\s*\([^)]*\)',
+    re.IGNORECASE
+)
+# 紧跟在表名后时不是别名的关键字
+_NOT_ALIAS = {
+    'where', 'join', 'inner', 'cross', 'left', 'right', 'outer', 'natural', 'straight_join', 'on', 'using',
+    'set', 'group', 'order', 'limit', 'having', 'window', 'union', 'except', 'intersect', 'for', 'lock',
+    'use', 'ignore', 'force', 'into', 'values', 'value', 'select', 'partition', 'to', 'from', 'with',
+    'returning', 'procedure', 'as'
+}
+_COMMA_PATTERN = re.compile(r'\s*,')
+_USING_PATTERN = re.compile(r'\s+USING\s*\(', re.IGNORECASE)
+_ON_PATTERN = re.compile(r'\s+ON\b', re.IGNORECASE)
+# JOIN 条件之后可能出现的子句
+_CLAUSE_PATTERN = re.compile(
+    r'\s(?:JOIN|INNER|CROSS|LEFT|RIGHT|NATURAL|STRAIGHT_JOIN|WHERE|GROUP|ORDER|LIMIT|HAVING|WINDOW|UNION'
+    r'|EXCEPT|INTERSECT|FOR|LOCK|SET)\b',
+    re.IGNORECASE
+)
+# 读语句中表列表的起始位置
+_READ_KEYWORD_PATTERN = re.compile(r'\b(?:FROM|JOIN|STRAIGHT_JOIN)\b', re.IGNORECASE)
+# 写语句的开头（含 LOW_PRIORITY/IGNORE 等修饰词），之后是目标表或表列表
+_WRITE_HEAD_PATTERN = re.compile(
+    r'^\s*(?:(?:INSERT|REPLACE)(?:\s+(?:LOW_PRIORITY|DELAYED|HIGH_PRIORITY|IGNORE))*(?:\s+INTO)?'
+    r'|UPDATE(?:\s+(?:LOW_PRIORITY|IGNORE))*'
+    r'|DELETE(?:\s+(?:LOW_PRIORITY|QUICK|IGNORE))*(?:\s+FROM)?'
+    r'|TRUNCATE(?:\s+TABLE)?'
+    r'|ALTER(?:\s+(?:ONLINE|IGNORE))*\s+TABLE'
+    r'|DROP(?:\s+TEMPORARY)?\s+TABLE(?:\s+IF\s+EXISTS)?'
+    r'|RENAME\s+TABLE)(?=[\s`])',
+    re.IGNORECASE
+)
+
+def _normalize_table(name):
+    """去掉库名和反引号，统一小写"""
+    return ''.join(name.split()).split('.')[-1].strip('`').lower()
+
+def _skip_parentheses(sql, pos):
+    """pos 指向左括号，返回匹配的右括号之后的位置，括号不匹配时返回 None"""
+    depth = 0
+    for index in range(pos, len(sql)):
+        if sql[index] == '(':
+            depth += 1
+        elif sql[index] == ')':
+            depth -= 1
+            if depth == 0:
+                return index + 1
+    return None
+
+def _skip_join_condition(sql, pos):
+    """
+    跳过 JOIN 的 ON/USING 条件，使 "JOIN b ON a.id = b.id, c" 中逗号后的表也能被解析
+    :return: 条件之后的位置（遇到同层的逗号或子句关键字为止），括号不匹配时返回 None
+    """
+    match = _USING_PATTERN.match(sql, pos)
+    if match:
+        return _skip_parentheses(sql, match.end() - 1)
+    match = _ON_PATTERN.match(sql, pos)
+    if not match:
+        return pos
+    pos = match.end()
+    while pos < len(sql):
+        char = sql[pos]
+        if char == '(':
+            pos = _skip_parentheses(sql, pos)
+            if pos is None:
+                return None
+            continue
+        if char in ',)' or _CLAUSE_PATTERN.match(sql, pos):
+            return pos
+        pos += 1
+    return pos
+
+def _parse_table_list(sql, pos):
+    """
+    解析从 pos 开始的逗号分隔表列表，如 "orders o, users AS u"、"t PARTITION (p0) USE INDEX (idx)"
+    :return: (表名集合, 是否至少解析出一个表或派生表)
+    """
+    tables = set()
+    parsed = False
+    while True:
+        stripped = len(sql) - len(sql[pos:].lstrip())
+        if stripped < len(sql) and sql[stripped] == '(':
+            # 派生表：子查询中的表由 FROM/JOIN 单独提取
+            pos = _skip_parentheses(sql, stripped)
+            if pos is None:
+                return tables, parsed
+        else:
+            match = _TABLE_PATTERN.match(sql, pos)
+            if not match or match.group(1).lower() in _NOT_ALIAS:
+                return tables, parsed
+            tables.add(_normalize_table(match.group(1)))
+            pos = match.end()
+            match = _PARTITION_PATTERN.match(sql, pos)
+            if match:
+                pos = match.end()
+        parsed = True
+        match = _ALIAS_PATTERN.match(sql, pos)
+        if match and match.group(1).lower() not in _NOT_ALIAS:
+            pos = match.end()
+        match = _INDEX_HINT_PATTERN.match(sql, pos)
+        while match:
+            pos = match.end()
+            match = _INDEX_HINT_PATTERN.match(sql, pos)
+        pos = _skip_join_condition(sql, pos)
+        if pos is None:
+            return tables, parsed
+        comma = _COMMA_PATTERN.match(sql, pos)
+        if not comma:
+            return tables, parsed
+        pos = comma.end()
+
+def extract_read_tables(sql):
+    """提取查询语句引用的表名（FROM / JOIN 后的表列表，包括子查询中的表）"""
+    tables = set()
+    for match in _READ_KEYWORD_PATTERN.finditer(sql):
+        # EXTRACT(YEAR FROM ...) 等函数中的 FROM 后面不是表，多提取的名称只会导致多失效
+        tables |= _parse_table_list(sql, match.end())[0]
+    return tables
+
+def extract_write_tables(sql):
+    """
+    提取写语句影响的表名（宁可多失效，也不漏失效）
+    :return: 表名集合；无法确定目标表时（存储过程、多语句、无法识别的写法等）返回 None，表示需要使全部缓存失效
+    """
+    statement = sql.strip().rstrip(';')
+    if ';' in statement:
+        return None
+    tables = extract_read_tables(statement)
+    match = _WRITE_HEAD_PATTERN.match(statement)
+    if not match:
+        # 除查询外无法识别的语句都按影响全部表处理
+        return tables if re.match(r'\s*SELECT\b', statement, re.IGNORECASE) else None
+    if re.match(r'\s*RENAME', statement, re.IGNORECASE):
+        names = re.findall(_IDENTIFIER, statement[match.end():])
+        return tables | {_normalize_table(name) for name in names if name.lower() != 'to'}
+    targets, parsed = _parse_table_list(statement, match.end())
+    if not parsed or not targets:
+        return None
+    return tables | targets
+
+# 全局版本号对应的“表名”，invalidate_all 时递增
+_ALL_TABLES = '*'
+
+class QueryCache:
+    """
+    查询结果缓存
+    - backend='local'：进程内 LRU，按表名标签失效
+    - backend='redis'：使用 redis_util 跨进程共享，按表版本号失效
+    """
+    
+    def __init__(self, max_size=1024, backend='local', key_prefix='th_cnd_utils:query_cache', codec=None):
+        """
+        :param max_size: 进程内缓存的最大条目数
+        :param backend: 'local' 或 'redis'
+        :param key_prefix: Redis 键前缀
+        :param codec: redis 后端中结果的编码方式，默认使用 REDIS_CACHE_CODEC（json）；
+                      json 编码下 datetime/Decimal 等类型变为字符串，pickle 只应在信任 Redis 中全部数据时使用
+        """
+        if backend not in ('local', 'redis'):
+            raise ValueError(f"不支持的缓存后端: {backend}")
+        self.max_size = max_size
+        self.backend = backend
+        self.key_prefix = key_prefix
+        self.codec = codec or config['redis']['cache_codec']
+        self._entries = OrderedDict()  # key -> (expires_at, tables, value)
+        self._tags = {}  # table -> set(key)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Redis 读写或失效失败的次数，失败时退化为直接查询数据库
+        self.errors = 0
+        # 每次失效递增，用于丢弃查询期间发生过失效的结果
+        self.generation = 0
+    
+    @staticmethod
+    def make_key(sql, params=None):
+        """
+        根据 SQL 和参数生成缓存键
+        只去掉首尾空白，语句中间的空白可能位于字符串常量中，压缩后不同的查询会得到相同的键
+        """
+        raw = sql.strip() + '\x00' + repr(params)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    
+    def get(self, sql, params=None):
+        """
+        读取缓存
+        :return: (是否命中, 结果, slot)，未命中时将 slot 传给 set 写入结果
+        """
+        key = self.make_key(sql, params)
+        tables = extract_read_tables(sql)
+        if self.backend == 'redis':
+            # 键中已包含查询前的表版本号，期间发生的写入会使该键自然失效
+            try:
+                found, value, slot = self._redis_get(key, tables)
+            except Exception as e:
+                # Redis 不可用时按未命中处理，slot 为 None 时 set 不写入
+                self._on_error('读取', e)
+                found, value, slot = False, None, None
+        else:
+            with self._lock:
+                generation = self.generation
+            found, value = self._local_get(key)
+            slot = (key, tables, generation)
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return found, value, slot
+    
+    def set(self, slot, value, ttl):
+        """
+        写入缓存
+        :param slot: get 返回的 slot
+        :param value: 查询结果
+        :param ttl: 过期秒数
+        """
+        if self.backend == 'redis':
+            if slot is None:
+                return
+            try:
+                self._redis_set(slot, value, ttl)
+            except Exception as e:
+                self._on_error('写入', e)
+        else:
+            self._local_set(slot, value, ttl)
+    
+    def invalidate_tables(self, tables):
+        """使引用了指定表的缓存全部失效"""
+        tables = {_normalize_table(table) for table in tables}
+        if not tables:
+            return
+        if self.backend == 'redis':
+            from .redis import redis_util
+            try:
+                pipe = redis_util.connect().pipeline(transaction=False)
+                for table in tables:
+                    pipe.incr(self._version_key(table))
+                pipe.execute()
+            except Exception as e:
+                # 写操作已提交，失效失败不能让调用方误以为写入失败而重试
+                self._on_error(f"使表 {', '.join(sorted(tables))} 失效", e)
+        else:
+            with self._lock:
+                for table in tables:
+                    for key in self._tags.pop(table, ()):
+                        self._entries.pop(key, None)
+        with self._lock:
+            self.invalidations += 1
+            self.generation += 1
+    
+    def invalidate_all(self):
+        """使全部缓存失效"""
+        if self.backend == 'redis':
+            from .redis import redis_util
+            try:
+                redis_util.connect().incr(self._version_key(_ALL_TABLES))
+            except Exception as e:
+                self._on_error('使全部缓存失效', e)
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self.invalidations += 1
+            self.generation += 1
+    
+    def invalidate_sql(self, sql):
+        """根据写语句使相关表的缓存失效，无法确定影响的表时使全部缓存失效"""
+        tables = extract_write_tables(sql)
+        if tables is None:
+            self.invalidate_all()
+        else:
+            self.invalidate_tables(tables)
+    
+    def clear(self):
+        """清空进程内缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+    
+    def stats(self):
+        """缓存命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'backend': self.backend,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'invalidations': self.invalidations,
+                'errors': self.errors
+            }
+    
+    def _on_error(self, action, error):
+        with self._lock:
+            self.errors += 1
+        print(f"查询缓存{action}失败: {error}")
+    
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, tables, value = entry
+            if expires_at <= time.monotonic():
+                self._remove_local(key, tables)
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+    
+    def _local_set(self, slot, value, ttl):
+        key, tables, generation = slot
+        with self._lock:
+            # 查询期间发生过失效，结果可能已过时，不写入
+            if generation != self.generation:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._remove_tags(key, old[1])
+            self._entries[key] = (time.monotonic() + ttl, tables, value)
+            for table in tables:
+                self._tags.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_size:
+                old_key, (_, old_tables, _) = self._entries.popitem(last=False)
+                self._remove_tags(old_key, old_tables)
+    
+    def _remove_local(self, key, tables):
+        self._entries.pop(key, None)
+        self._remove_tags(key, tables)
+    
+    def _remove_tags(self, key, tables):
+        for table in tables:
+            keys = self._tags.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[table]
+    
+    def _version_key(self, table):
+        return f"{self.key_prefix}:version:{table}"
+    
+    def _redis_key(self, client, key, tables):
+        """缓存键中带上各表及全局的版本号，写入时递增版本号即可让旧缓存失效"""
+        tables = sorted(tables) + [_ALL_TABLES]
+        versions = client.mget([self._version_key(table) for table in tables]) if tables else []
+        version_part = ','.join(f"{table}={version or 0}" for table, version in zip(tables, versions))
+        return f"{self.key_prefix}:{key}:{hashlib.sha1(version_part.encode('utf-8')).hexdigest()}"
+    
+    def _redis_get(self, key, tables):
+        from .redis import redis_util
+        client = redis_util.connect()
+        redis_key = self._redis_key(client, key, tables)
+        data = redis_util.connect_binary().get(redis_key)
+        if data is None:
+            return False, None, redis_key
+        return True, unpack(data, self.codec), redis_key
+    
+    def _redis_set(self, redis_key, value, ttl):
+        from .redis import redis_util
+        redis_util.set(redis_key, value, max(int(ttl), 1), codec=self.codec)
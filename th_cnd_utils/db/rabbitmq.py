@@ -1,15 +1,46 @@
 import pika
 import os
 import json
+import time
+import random
+import threading
+from functools import partial
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
 from dotenv import load_dotenv
+from ..config import config
+from ..instrumentation import instrumentation
+from ..serialization import (
+    serialize, deserialize, content_type, compress, decompress, COMPRESSORS
+)
 
 # 加载环境变量
 load_dotenv()
 
+# 连接中断类异常：发送时暂存消息，消费时自动重连
+_CONNECTION_ERRORS = (pika.exceptions.AMQPConnectionError, pika.exceptions.ChannelWrongStateError)
+
+# 记录本工具使用的编码方式的消息头，只有带该消息头的消息才在消费时解码
+CODEC_HEADER = 'x-th-codec'
+
 class RabbitMQUtil:
     _instance = None
     _connection = None
     _channel = None
+    # 当前通道上已声明过的队列，通道重建后清空
+    _declared_queues = None
+    # 发布确认通道及未确认的消息：delivery_tag -> (Future, 队列名)
+    _confirm_channel = None
+    _pending_confirms = None
+    _confirm_seq = 0
+    # 执行 start_consuming 的线程，其他线程中的确认操作需要转交给该线程
+    _consumer_thread = None
+    # 连接不可用时暂存的待发送消息：(队列名, 消息体, 消息属性)
+    _publish_buffer = None
+    # 发送失败后，在 _retry_at 之前不再尝试连接，消息直接暂存
+    _retry_at = 0
+    _retry_delay = 0
+    _closing = False
     
     def __new__(cls):
         if cls._instance is None:
@@ -24,6 +55,19 @@ class RabbitMQUtil:
             self.user = os.getenv('RABBITMQ_USER', 'guest')
             self.password = os.getenv('RABBITMQ_PASSWORD', 'guest')
             self.vhost = os.getenv('RABBITMQ_VHOST', '/')
+            self.confirm_window = config['rabbitmq']['confirm_window']
+            self.confirm_timeout = config['rabbitmq']['confirm_timeout']
+            self.prefetch_count = config['rabbitmq']['prefetch_count']
+            self.heartbeat = config['rabbitmq']['heartbeat']
+            self.reconnect_delay = config['rabbitmq']['reconnect_delay']
+            self.reconnect_max_delay = config['rabbitmq']['reconnect_max_delay']
+            self.reconnect_attempts = config['rabbitmq']['reconnect_attempts']
+            self.publish_buffer_size = config['rabbitmq']['publish_buffer_size']
+            self.codec = config['rabbitmq']['codec']
+            self.compression = config['rabbitmq']['compression'] or None
+            self.compress_threshold = config['rabbitmq']['compress_threshold']
+            self.accept = tuple(config['rabbitmq']['accept'])
+            self._publish_buffer = deque()
     
     def connect(self):
         """建立 RabbitMQ 连接"""
@@ -34,55 +78,480 @@ class RabbitMQUtil:
                     host=self.host,
                     port=self.port,
                     virtual_host=self.vhost,
-                    credentials=credentials
+                    credentials=credentials,
+                    heartbeat=self.heartbeat
                 )
+                self._fail_pending_confirms("RabbitMQ 连接已断开，消息未确认")
+                self._closing = False
                 self._connection = pika.BlockingConnection(parameters)
-                self._channel = self._connection.channel()
+                self._open_channel()
+                self._retry_delay = 0
                 print("RabbitMQ 连接成功")
+            elif not self._channel or self._channel.is_closed:
+                # 通道因异常被服务端关闭时，在原连接上重新打开
+                self._open_channel()
             return self._channel
         except Exception as e:
             print(f"RabbitMQ 连接失败: {e}")
             raise e
     
-    def send_message(self, queue, message):
-        """发送消息到队列"""
-        try:
-            channel = self.connect()
+    def _open_channel(self):
+        self._channel = self._connection.channel()
+        self._declared_queues = set()
+    
+    def _drop_connection(self):
+        """丢弃已失效的连接，下次使用时重新建立"""
+        connection = self._connection
+        self._connection = None
+        self._channel = None
+        self._fail_pending_confirms("RabbitMQ 连接已断开，消息未确认")
+        if connection is not None and connection.is_open:
+            try:
+                connection.close()
+            except Exception:
+                pass
+    
+    def reconnect(self):
+        """
+        按指数退避重建连接，直到成功或达到 RABBITMQ_RECONNECT_ATTEMPTS 次
+        :return: 新的通道
+        """
+        self._drop_connection()
+        delay = self.reconnect_delay
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                channel = self.connect()
+                self._flush_publish_buffer()
+                return channel
+            except _CONNECTION_ERRORS as e:
+                if self._closing or (self.reconnect_attempts and attempt >= self.reconnect_attempts):
+                    raise e
+                self._drop_connection()
+                # 随机抖动避免大量客户端同时重连
+                wait = delay * random.uniform(0.5, 1)
+                print(f"RabbitMQ 第 {attempt} 次重连失败，{wait:.1f} 秒后重试: {e}")
+                time.sleep(wait)
+                delay = min(delay * 2, self.reconnect_max_delay)
+    
+    def _buffer_messages(self, queue, messages, error):
+        """连接不可用时暂存消息，缓冲区已满时抛出原异常"""
+        if len(self._publish_buffer) + len(messages) > self.publish_buffer_size:
+            raise error
+        self._publish_buffer.extend((queue, body, properties) for body, properties in messages)
+        print(f"RabbitMQ 连接不可用，{len(messages)} 条消息已暂存，"
+              f"缓冲区 {len(self._publish_buffer)}/{self.publish_buffer_size}: {error}")
+    
+    def _on_publish_error(self, queue, messages, error):
+        """
+        发送时连接中断：丢弃连接并立即重连重发一次（空闲连接可能因错过心跳已被服务端关闭），
+        仍然失败时按指数退避推迟下次连接，消息放入缓冲区
+        """
+        self._drop_connection()
+        if not self._retry_delay:
+            sent = 0
+            try:
+                self.connect()
+                self._flush_publish_buffer()
+                channel = self.declare_queue(queue)
+                for body, properties in messages:
+                    channel.basic_publish(exchange='', routing_key=queue, body=body, properties=properties)
+                    sent += 1
+                print(f"RabbitMQ 重连成功，{sent} 条消息已发送到队列 '{queue}'")
+                return
+            except _CONNECTION_ERRORS as e:
+                self._drop_connection()
+                messages = messages[sent:]
+                error = e
+        self._retry_delay = min(self._retry_delay * 2, self.reconnect_max_delay) or self.reconnect_delay
+        self._retry_at = time.monotonic() + self._retry_delay
+        self._buffer_messages(queue, messages, error)
+    
+    def _flush_publish_buffer(self):
+        """重连后按顺序发送暂存的消息"""
+        if not self._publish_buffer:
+            return
+        count = len(self._publish_buffer)
+        with instrumentation.track('rabbitmq', 'flush_buffer') as op:
+            while self._publish_buffer:
+                queue, body, properties = self._publish_buffer[0]
+                channel = self.declare_queue(queue)
+                channel.basic_publish(exchange='', routing_key=queue, body=body, properties=properties)
+                self._publish_buffer.popleft()
+            op.rows = count
+        print(f"已补发 {count} 条暂存消息")
+    
+    def _publish_buffered(self, queue, messages):
+        """重连等待期间已有消息暂存时，新消息直接暂存以保持顺序"""
+        if self._publish_buffer and time.monotonic() < self._retry_at:
+            self._buffer_messages(queue, messages, ConnectionError("RabbitMQ 连接不可用，等待重连"))
+            return True
+        return False
+    
+    def declare_queue(self, queue):
+        """声明持久化队列，同一通道上只声明一次"""
+        channel = self.connect()
+        if queue not in self._declared_queues:
             channel.queue_declare(queue=queue, durable=True)
-            
+            self._declared_queues.add(queue)
+        return channel
+    
+    @staticmethod
+    def _encode_message(message, codec, compression=None, threshold=1024):
+        """
+        编码消息
+        :return: (消息体 bytes, content_type, content_encoding)，text 编码时 content_type 为 None
+        """
+        if codec == 'text':
             # 如果消息是字典，转换为 JSON 字符串
             if isinstance(message, dict):
                 message = json.dumps(message)
+            if isinstance(message, str):
+                message = message.encode('utf-8')
+            return message, None, None
+        body = serialize(message, codec)
+        if compression and len(body) >= threshold:
+            compressed = compress(body, compression)
+            # 压缩无收益时保留原始数据
+            if len(compressed) < len(body):
+                return compressed, content_type(codec), compression
+        return body, content_type(codec), None
+    
+    @staticmethod
+    def _decode_body(body, properties, accept):
+        """
+        解码本工具编码的消息：按 CODEC_HEADER 消息头解码、按 content_encoding 解压，编码方式不在 accept 中时保持原始 bytes；
+        其他消息（包括其他生产者发送的、带 content_type 的消息）与旧版本一致，按 UTF-8 字符串处理
+        :param properties: 带 headers/content_encoding 属性的对象（pika.BasicProperties 或 aio_pika 消息）
+        :param accept: 允许解码的编码方式
+        """
+        codec = (properties.headers or {}).get(CODEC_HEADER)
+        if isinstance(codec, bytes):
+            codec = codec.decode('utf-8')
+        if codec is None:
+            return body.decode('utf-8')
+        if codec not in accept:
+            return body
+        if properties.content_encoding in COMPRESSORS:
+            body = decompress(body, properties.content_encoding)
+        return deserialize(body, codec)
+    
+    def _decode_or_reject(self, ch, method, properties, body, accept):
+        """
+        解码消息体，无法解码时拒绝消息且不重新入队（重新投递后仍会解码失败）
+        :return: (是否成功, 解码后的消息体)
+        """
+        try:
+            return True, self._decode_body(body, properties, accept)
+        except Exception as e:
+            print(f"解码消息失败，已拒绝: {e}")
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+            return False, None
+    
+    def _prepare_message(self, message, codec=None, persistent=True):
+        """编码消息并生成消息属性"""
+        codec = codec or self.codec
+        body, message_content_type, content_encoding = self._encode_message(
+            message, codec, self.compression, self.compress_threshold)
+        properties = pika.BasicProperties(
+            delivery_mode=2 if persistent else 1,  # 2 表示消息持久化
+            content_type=message_content_type,
+            content_encoding=content_encoding,
+            headers={CODEC_HEADER: codec} if message_content_type else None
+        )
+        return body, properties
+    
+    def send_message(self, queue, message, confirm=False, codec=None, persistent=True):
+        """
+        发送消息到队列
+        :param confirm: 是否等待服务端确认消息已持久化，被拒绝或超时时抛出异常
+        :param codec: 消息编码方式，默认使用 RABBITMQ_CODEC：text（字典转 JSON 字符串）、raw（二进制）、json、msgpack、pickle
+        :param persistent: 是否持久化消息，非持久化消息不写磁盘，吞吐量更高，但服务端重启后丢失
+        """
+        try:
+            message, properties = self._prepare_message(message, codec, persistent)
+            # 需要确认的消息不暂存，连接不可用时直接抛出异常
+            if not confirm and self._publish_buffered(queue, [(message, properties)]):
+                return
             
-            channel.basic_publish(
-                exchange='',
-                routing_key=queue,
-                body=message,
-                properties=pika.BasicProperties(
-                    delivery_mode=2,  # 消息持久化
-                )
-            )
+            try:
+                channel = self.declare_queue(queue)
+                self._flush_publish_buffer()
+                with instrumentation.track('rabbitmq', 'publish', queue) as op:
+                    op.bytes = len(message)
+                    if confirm:
+                        future = self._publish_confirmed(queue, message, properties)
+                        if not self._wait_pending(0, self.confirm_timeout):
+                            raise TimeoutError(f"等待发布确认超时: 队列 '{queue}'")
+                        future.result()
+                    else:
+                        channel.basic_publish(
+                            exchange='',
+                            routing_key=queue,
+                            body=message,
+                            properties=properties
+                        )
+            except _CONNECTION_ERRORS as e:
+                if confirm:
+                    self._drop_connection()
+                    raise e
+                self._on_publish_error(queue, [(message, properties)], e)
+                return
             print(f"消息已发送到队列 '{queue}'")
         except Exception as e:
             print(f"发送消息失败: {e}")
             raise e
     
-    def consume_messages(self, queue, callback, auto_ack=False):
-        """消费队列中的消息"""
+    def publish_batch(self, queue, messages, confirm=False, codec=None, persistent=True):
+        """
+        批量发送消息到队列，队列只声明一次，不逐条打印日志
+        :param queue: 队列名
+        :param messages: 消息列表，按 codec 编码，text 编码时字典会转换为 JSON 字符串
+        :param confirm: 是否使用发布确认，为 True 时按 confirm_window 窗口发送并等待全部确认，有消息被拒绝时抛出异常
+        :param codec: 消息编码方式，默认使用 RABBITMQ_CODEC
+        :param persistent: 是否持久化消息
+        :return: 发送的消息数（不使用发布确认时包括因连接中断而暂存的消息）
+        """
         try:
-            channel = self.connect()
-            channel.queue_declare(queue=queue, durable=True)
+            messages = [self._prepare_message(message, codec, persistent) for message in messages]
+            if not confirm and self._publish_buffered(queue, messages):
+                return len(messages)
+            futures = []
+            count = 0
+            try:
+                channel = self.declare_queue(queue)
+                self._flush_publish_buffer()
+                with instrumentation.track('rabbitmq', 'publish_batch', queue) as op:
+                    op.bytes = 0
+                    for message, properties in messages:
+                        if confirm:
+                            futures.append(self._publish_confirmed(queue, message, properties))
+                        else:
+                            channel.basic_publish(exchange='', routing_key=queue, body=message, properties=properties)
+                        op.bytes += len(message)
+                        count += 1
+                    op.rows = count
+                    if confirm:
+                        if not self.wait_for_confirms(self.confirm_timeout):
+                            raise TimeoutError(f"等待发布确认超时: 队列 '{queue}'")
+                        rejected = sum(1 for future in futures if future.exception() is not None)
+                        if rejected:
+                            raise Exception(f"{rejected} 条消息被服务端拒绝: 队列 '{queue}'")
+            except _CONNECTION_ERRORS as e:
+                if confirm:
+                    self._drop_connection()
+                    raise e
+                # 暂存尚未发送的消息
+                self._on_publish_error(queue, messages[count:], e)
+                return len(messages)
+            print(f"{count} 条消息已发送到队列 '{queue}'")
+            return count
+        except Exception as e:
+            print(f"批量发送消息失败: {e}")
+            raise e
+    
+    def _open_confirm_channel(self):
+        """打开开启了发布确认的专用通道"""
+        self.connect()
+        if self._confirm_channel is None or self._confirm_channel.is_closed:
+            self._fail_pending_confirms("RabbitMQ 通道已关闭，消息未确认")
+            channel = self._connection.channel()
+            # BlockingChannel.confirm_delivery 每条消息都同步等待确认，
+            # 这里在底层通道上注册确认回调，以便同时保留多条未确认消息
+            selected = []
+            channel._impl.confirm_delivery(ack_nack_callback=self._on_confirm, callback=selected.append)
+            deadline = time.monotonic() + self.confirm_timeout
+            while not selected:
+                if channel.is_closed:
+                    raise Exception("开启发布确认失败: RabbitMQ 通道已关闭")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    try:
+                        channel.close()
+                    except Exception:
+                        pass
+                    raise TimeoutError("等待开启发布确认超时")
+                self._connection.process_data_events(time_limit=min(remaining, 0.1))
+            self._confirm_channel = channel
+            self._pending_confirms = OrderedDict()
+            self._confirm_seq = 0
+        return self._confirm_channel
+    
+    def _on_confirm(self, frame):
+        """处理服务端的 Basic.Ack / Basic.Nack，multiple 表示该编号及之前的消息全部确认"""
+        method = frame.method
+        acked = isinstance(method, pika.spec.Basic.Ack)
+        if method.multiple:
+            tags = []
+            for tag in self._pending_confirms:
+                if tag > method.delivery_tag:
+                    break
+                tags.append(tag)
+        else:
+            tags = [method.delivery_tag]
+        for tag in tags:
+            item = self._pending_confirms.pop(tag, None)
+            if item is None:
+                continue
+            future, queue = item
+            if acked:
+                future.set_result(True)
+            else:
+                future.set_exception(Exception(f"消息被服务端拒绝: 队列 '{queue}'"))
+        # 让等待中的 process_data_events 立即返回
+        self._connection.call_later(0, lambda: None)
+    
+    def _fail_pending_confirms(self, reason):
+        if self._pending_confirms:
+            for future, _ in self._pending_confirms.values():
+                future.set_exception(Exception(reason))
+        self._pending_confirms = None
+        self._confirm_channel = None
+    
+    def _publish_confirmed(self, queue, message, properties):
+        channel = self._open_confirm_channel()
+        # 未确认的消息达到窗口上限时，先等待部分确认
+        if len(self._pending_confirms) >= self.confirm_window:
+            if not self._wait_pending(self.confirm_window - 1, self.confirm_timeout):
+                raise TimeoutError(f"等待发布确认超时: 队列 '{queue}'")
+            channel = self._open_confirm_channel()
+        channel.basic_publish(exchange='', routing_key=queue, body=message, properties=properties)
+        self._confirm_seq += 1
+        future = Future()
+        self._pending_confirms[self._confirm_seq] = (future, queue)
+        return future
+    
+    def publish_confirmed(self, queue, message, callback=None, codec=None):
+        """
+        以发布确认模式发送消息，不等待确认立即返回
+        未确认的消息数达到 confirm_window（RABBITMQ_CONFIRM_WINDOW）时先等待部分确认再发送
+        :param queue: 队列名
+        :param message: 消息内容，按 codec 编码，text 编码时字典会转换为 JSON 字符串
+        :param callback: 收到确认后调用，参数为 Future，future.exception() 不为 None 表示消息被拒绝
+        :param codec: 消息编码方式，默认使用 RABBITMQ_CODEC
+        :return: concurrent.futures.Future，确认结果在后续调用 wait_for_confirms 或继续发送时更新
+        """
+        try:
+            self.declare_queue(queue)
+            message, properties = self._prepare_message(message, codec)
+            with instrumentation.track('rabbitmq', 'publish', queue) as op:
+                op.bytes = len(message)
+                future = self._publish_confirmed(queue, message, properties)
+            if callback is not None:
+                future.add_done_callback(callback)
+            return future
+        except Exception as e:
+            print(f"发送消息失败: {e}")
+            raise e
+    
+    def _wait_pending(self, max_pending, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._pending_confirms and len(self._pending_confirms) > max_pending:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            # 在消费回调中调用时无法分派事件，限制单次等待时间以便重新检查
+            self._connection.process_data_events(time_limit=1 if remaining is None else min(remaining, 1))
+        return True
+    
+    def wait_for_confirms(self, timeout=None):
+        """
+        等待所有未确认的消息收到确认
+        :param timeout: 最长等待时间（秒），None 表示一直等待
+        :return: 超时前是否全部收到确认（包括被拒绝）
+        """
+        try:
+            if not self._pending_confirms:
+                return True
+            with instrumentation.track('rabbitmq', 'wait_for_confirms') as op:
+                op.rows = len(self._pending_confirms)
+                return self._wait_pending(0, timeout)
+        except Exception as e:
+            print(f"等待发布确认失败: {e}")
+            raise e
+    
+    def consume_messages(self, queue, callback, auto_ack=False, prefetch_count=None, workers=0, worker_type='thread',
+                         accept=None):
+        """
+        消费队列中的消息
+        :param queue: 队列名
+        :param callback: 消息处理函数，参数为 message_info 字典，body 按消息的 content_type/content_encoding 解码，
+                         未标记 content_type 的消息为 UTF-8 字符串，不允许解码的消息为原始 bytes
+        :param auto_ack: 回调成功后自动确认，回调抛出异常时拒绝并重新入队
+        :param prefetch_count: 未确认消息数上限，默认使用 RABBITMQ_PREFETCH_COUNT，未配置时等于 workers（至少为 1）
+        :param workers: 并发处理消息的工作线程/进程数，0 表示在连接线程中逐条处理
+        :param worker_type: 'thread' 或 'process'；进程模式下 callback 必须可以被 pickle，
+                            message_info 不含 channel/method，且需要 auto_ack=True
+        :param accept: 允许解码的编码方式，默认使用 RABBITMQ_ACCEPT（json/msgpack/raw），pickle 需要显式加入
+        """
+        if worker_type not in ('thread', 'process'):
+            raise ValueError(f"不支持的工作模式: {worker_type}")
+        if workers and worker_type == 'process' and not auto_ack:
+            raise ValueError("进程模式下无法在工作进程中确认消息，需要 auto_ack=True")
+        accept = tuple(self.accept if accept is None else accept)
+        executor = None
+        try:
+            self._consumer_thread = threading.get_ident()
+            if workers:
+                executor_class = ThreadPoolExecutor if worker_type == 'thread' else ProcessPoolExecutor
+                executor = executor_class(max_workers=workers)
+            
+            def finish(ch, method, size, error, start):
+                """工作线程/进程处理完成后，在连接线程中记录统计并确认消息"""
+                if instrumentation.enabled:
+                    # 耗时包括在线程池中排队的时间
+                    instrumentation.observe('rabbitmq', 'consume', time.perf_counter() - start,
+                                            nbytes=size, error=error, statement=queue)
+                if error is not None:
+                    print(f"处理消息失败: {error}")
+                if auto_ack and ch.is_open:
+                    if error is None:
+                        ch.basic_ack(delivery_tag=method.delivery_tag)
+                    else:
+                        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+            
+            def dispatch(ch, method, properties, body):
+                """提交到工作线程/进程，连接线程继续接收消息"""
+                decoded, message_body = self._decode_or_reject(ch, method, properties, body, accept)
+                if not decoded:
+                    return
+                message_info = {
+                    'body': message_body,
+                    'delivery_tag': method.delivery_tag,
+                    'properties': properties
+                }
+                if worker_type == 'thread':
+                    # 工作线程中调用 manual_ack/manual_nack 会自动转交给连接线程执行
+                    message_info['channel'] = ch
+                    message_info['method'] = method
+                start = time.perf_counter()
+                
+                def on_done(future):
+                    try:
+                        ch.connection.add_callback_threadsafe(
+                            partial(finish, ch, method, len(body), future.exception(), start))
+                    except pika.exceptions.ConnectionWrongStateError:
+                        # 连接已断开，未确认的消息会被服务端重新投递
+                        pass
+                
+                executor.submit(callback, message_info).add_done_callback(on_done)
             
             def wrapper(ch, method, properties, body):
+                decoded, message_body = self._decode_or_reject(ch, method, properties, body, accept)
+                if not decoded:
+                    return
                 try:
                     # 将消息信息传递给回调函数，包括channel和method用于手动确认
                     message_info = {
-                        'body': body.decode('utf-8'),
+                        'body': message_body,
                         'channel': ch,
                         'method': method,
                         'properties': properties
                     }
-                    callback(message_info)
+                    with instrumentation.track('rabbitmq', 'consume', queue) as op:
+                        op.bytes = len(body)
+                        callback(message_info)
                     
                     # 如果启用了自动确认，则自动确认消息
                     if auto_ack:
@@ -93,18 +562,139 @@ class RabbitMQUtil:
                     if auto_ack:
                         ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
             
-            channel.basic_qos(prefetch_count=1)
-            channel.basic_consume(queue=queue, on_message_callback=wrapper, auto_ack=auto_ack)
-            print(f"开始消费队列 '{queue}' 中的消息")
-            channel.start_consuming()
+            def register(channel):
+                # prefetch_count 同时限制了排队等待工作线程/进程处理的消息数
+                channel.basic_qos(prefetch_count=prefetch_count or self.prefetch_count or max(workers, 1))
+                # auto_ack 表示回调完成后由本工具确认，服务端仍需等待确认
+                channel.basic_consume(queue=queue, on_message_callback=dispatch if executor else wrapper,
+                                      auto_ack=False)
+            
+            self._consume_forever(queue, register)
         except Exception as e:
             print(f"消费消息失败: {e}")
             raise e
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+                # 处理工作线程/进程最后提交的确认
+                if self._connection and self._connection.is_open:
+                    self._connection.process_data_events(time_limit=0)
+            self._consumer_thread = None
+    
+    def consume_batches(self, queue, callback, max_batch=500, max_wait_ms=1000, requeue=True, accept=None):
+        """
+        批量消费队列中的消息：累积到 max_batch 条或等待 max_wait_ms 毫秒后，以列表形式交给回调处理，
+        回调成功后用一次 multiple=True 的确认完成整批确认，回调抛出异常时整批拒绝
+        :param queue: 队列名
+        :param callback: 批量处理函数，参数为 message_info 字典列表，字典包含 body/delivery_tag/properties
+        :param max_batch: 每批最多的消息数，同时作为 prefetch_count
+        :param max_wait_ms: 收到一批中的第一条消息后最多等待的毫秒数
+        :param requeue: 处理失败时是否重新入队
+        :param accept: 允许解码的编码方式，默认使用 RABBITMQ_ACCEPT
+        """
+        accept = tuple(self.accept if accept is None else accept)
+        batch = []
+        batch_bytes = 0
+        timer = None
+        channel = None
+        try:
+            self._consumer_thread = threading.get_ident()
+            
+            def flush():
+                nonlocal timer, batch_bytes
+                if timer is not None:
+                    channel.connection.remove_timeout(timer)
+                    timer = None
+                if not batch:
+                    return
+                messages = list(batch)
+                nbytes = batch_bytes
+                batch.clear()
+                batch_bytes = 0
+                # 同一通道上的 delivery_tag 递增，确认最后一条即可覆盖整批
+                last_tag = messages[-1]['delivery_tag']
+                try:
+                    with instrumentation.track('rabbitmq', 'consume_batch', queue) as op:
+                        op.rows = len(messages)
+                        op.bytes = nbytes
+                        callback(messages)
+                    channel.basic_ack(delivery_tag=last_tag, multiple=True)
+                except Exception as e:
+                    print(f"批量处理消息失败: {e}")
+                    channel.basic_nack(delivery_tag=last_tag, multiple=True, requeue=requeue)
+            
+            def on_timeout():
+                nonlocal timer
+                timer = None
+                flush()
+            
+            def on_message(ch, method, properties, body):
+                nonlocal timer, batch_bytes
+                # 无法解码的消息单独拒绝，不影响同批的其他消息；整批确认时不会再确认已拒绝的消息
+                decoded, message_body = self._decode_or_reject(ch, method, properties, body, accept)
+                if not decoded:
+                    return
+                batch_bytes += len(body)
+                batch.append({
+                    'body': message_body,
+                    'delivery_tag': method.delivery_tag,
+                    'properties': properties
+                })
+                if len(batch) >= max_batch:
+                    flush()
+                elif timer is None:
+                    timer = ch.connection.call_later(max_wait_ms / 1000, on_timeout)
+            
+            def register(new_channel):
+                nonlocal channel, timer, batch_bytes
+                # 重连后旧通道上的 delivery_tag 已失效，未确认的消息会被服务端重新投递
+                channel = new_channel
+                batch.clear()
+                batch_bytes = 0
+                timer = None
+                channel.basic_qos(prefetch_count=max_batch)
+                channel.basic_consume(queue=queue, on_message_callback=on_message, auto_ack=False)
+            
+            self._consume_forever(queue, register)
+            # 停止消费后处理剩余的消息
+            if channel is not None and channel.is_open:
+                flush()
+        except Exception as e:
+            print(f"批量消费消息失败: {e}")
+            raise e
+        finally:
+            self._consumer_thread = None
+    
+    def _consume_forever(self, queue, register):
+        """
+        注册消费者并开始消费，连接中断时按指数退避重连，重新声明队列并重新注册消费者，
+        直到调用 stop_consuming 或 close
+        :param register: 接收通道并调用 basic_qos/basic_consume 的函数
+        """
+        while True:
+            try:
+                channel = self.declare_queue(queue)
+                register(channel)
+                print(f"开始消费队列 '{queue}' 中的消息")
+                channel.start_consuming()
+                return
+            except _CONNECTION_ERRORS as e:
+                if self._closing:
+                    return
+                print(f"RabbitMQ 连接中断，重连后继续消费队列 '{queue}': {e}")
+                self.reconnect()
+    
+    def _run_in_connection_thread(self, func):
+        """pika 连接不是线程安全的，在工作线程中调用时转交给连接线程执行"""
+        if self._consumer_thread is not None and threading.get_ident() != self._consumer_thread:
+            self._connection.add_callback_threadsafe(func)
+        else:
+            func()
     
     def manual_ack(self, channel, delivery_tag):
         """手动确认消息"""
         try:
-            channel.basic_ack(delivery_tag=delivery_tag)
+            self._run_in_connection_thread(partial(channel.basic_ack, delivery_tag=delivery_tag))
             print(f"消息 {delivery_tag} 已手动确认")
         except Exception as e:
             print(f"手动确认消息失败: {e}")
@@ -113,7 +703,7 @@ class RabbitMQUtil:
     def manual_nack(self, channel, delivery_tag, requeue=True):
         """手动拒绝消息"""
         try:
-            channel.basic_nack(delivery_tag=delivery_tag, requeue=requeue)
+            self._run_in_connection_thread(partial(channel.basic_nack, delivery_tag=delivery_tag, requeue=requeue))
             print(f"消息 {delivery_tag} 已手动拒绝")
         except Exception as e:
             print(f"手动拒绝消息失败: {e}")
@@ -123,17 +713,29 @@ class RabbitMQUtil:
         """停止消费消息"""
         try:
             if self._channel:
-                self._channel.stop_consuming()
+                self._run_in_connection_thread(self._channel.stop_consuming)
                 print("已停止消费消息")
         except Exception as e:
             print(f"停止消费消息失败: {e}")
             raise e
     
     def close(self):
-        """关闭 RabbitMQ 连接"""
+        """关闭 RabbitMQ 连接，关闭前补发暂存的消息，无法补发时关闭连接后抛出异常"""
+        error = None
+        if self._publish_buffer:
+            try:
+                self.connect()
+                self._flush_publish_buffer()
+            except Exception as e:
+                error = e
+        self._closing = True
+        self._fail_pending_confirms("RabbitMQ 连接已关闭，消息未确认")
         if self._connection and not self._connection.is_closed:
             self._connection.close()
             print("RabbitMQ 连接已关闭")
+        if error is not None:
+            print(f"RabbitMQ 连接已关闭，{len(self._publish_buffer)} 条暂存消息未发送: {error}")
+            raise error
 
 # 创建单例实例
 rabbitmq_util = RabbitMQUtil()
\ No newline at end of file
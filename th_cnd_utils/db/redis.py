@@ -1,13 +1,115 @@
 import redis
 import os
+import time
+import threading
+from redis.backoff import ExponentialBackoff
+from redis.retry import Retry
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from ..config import config
+from ..instrumentation import instrumentation
+from .near_cache import RedisNearCache
+from ..serialization import pack, unpack
 
 # 加载环境变量
 load_dotenv()
 
+def _chunked(items, size):
+    """按固定大小切分列表"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+class RedisConnectionPool(redis.BlockingConnectionPool):
+    """连接用尽时阻塞等待的 Redis 连接池，额外统计等待次数和等待耗时"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.waits = 0
+        self.wait_timeouts = 0
+        self.wait_seconds = 0.0
+    
+    def get_connection(self, *args, **kwargs):
+        # 队列为空说明连接已全部借出，需要等待其他线程归还
+        if not self.pool.empty():
+            return super().get_connection(*args, **kwargs)
+        start = time.monotonic()
+        timed_out = False
+        try:
+            return super().get_connection(*args, **kwargs)
+        except redis.ConnectionError:
+            timed_out = True
+            raise
+        finally:
+            with self._stats_lock:
+                self.waits += 1
+                self.wait_seconds += time.monotonic() - start
+                if timed_out:
+                    self.wait_timeouts += 1
+    
+    def stats(self):
+        """连接池使用情况"""
+        idle = sum(1 for connection in list(self.pool.queue) if connection is not None)
+        created = len(self._connections)
+        with self._stats_lock:
+            return {
+                'max_connections': self.max_connections,
+                'created': created,
+                'idle': idle,
+                'in_use': created - idle,
+                'waits': self.waits,
+                'wait_timeouts': self.wait_timeouts,
+                'wait_seconds': self.wait_seconds
+            }
+
+class RedisPipeline:
+    """命令数达到 flush_size 时自动提交的 Redis 管道，执行结果按顺序累积在 results 中"""
+    
+    def __init__(self, pipeline, flush_size=1000):
+        self._pipeline = pipeline
+        self.flush_size = flush_size
+        self.results = []
+        self._pending = 0
+    
+    def __getattr__(self, name):
+        attr = getattr(self._pipeline, name)
+        if not callable(attr):
+            return attr
+        
+        def command(*args, **kwargs):
+            attr(*args, **kwargs)
+            self._pending += 1
+            if self._pending >= self.flush_size:
+                self.flush()
+            return self
+        return command
+    
+    def __len__(self):
+        return self._pending
+    
+    def flush(self):
+        """提交已缓冲的命令"""
+        if self._pending:
+            with instrumentation.track('redis', 'pipeline') as op:
+                op.rows = self._pending
+                self.results.extend(self._pipeline.execute())
+            self._pending = 0
+        return self.results
+    
+    execute = flush
+    
+    def reset(self):
+        """丢弃未提交的命令"""
+        self._pipeline.reset()
+        self._pending = 0
+
 class RedisUtil:
     _instance = None
     _client = None
+    _pool = None
+    _binary_client = None
+    _binary_pool = None
+    _near_cache = None
     
     def __new__(cls):
         if cls._instance is None:
@@ -21,18 +123,51 @@ class RedisUtil:
             self.port = int(os.getenv('REDIS_PORT', 6379))
             self.password = os.getenv('REDIS_PASSWORD', '')
             self.db = int(os.getenv('REDIS_DB', 0))
+            self.max_connections = config['redis']['max_connections']
+            self.pool_timeout = config['redis']['pool_timeout']
+            self.socket_timeout = config['redis']['socket_timeout']
+            self.socket_connect_timeout = config['redis']['socket_connect_timeout']
+            self.socket_keepalive = config['redis']['socket_keepalive']
+            self.health_check_interval = config['redis']['health_check_interval']
+            self.retries = config['redis']['retries']
+            # 值编码配置
+            self.codec = config['redis']['codec']
+            self.compression = config['redis']['compression'] or None
+            self.compress_threshold = config['redis']['compress_threshold']
+    
+    def _create_client(self, decode_responses, redis_connect_func=None):
+        """
+        按连接池配置创建客户端
+        :param redis_connect_func: 新连接建立后执行的函数，用于客户端缓存开启 CLIENT TRACKING
+        """
+        kwargs = {'redis_connect_func': redis_connect_func} if redis_connect_func else {}
+        pool = RedisConnectionPool(
+            max_connections=self.max_connections,
+            timeout=self.pool_timeout,
+            host=self.host,
+            port=self.port,
+            password=self.password if self.password else None,
+            db=self.db,
+            decode_responses=decode_responses,
+            socket_timeout=self.socket_timeout,
+            socket_connect_timeout=self.socket_connect_timeout,
+            socket_keepalive=self.socket_keepalive,
+            health_check_interval=self.health_check_interval,
+            **kwargs
+        )
+        # 故障切换期间的连接错误和超时按指数退避重试
+        client = redis.Redis(
+            connection_pool=pool,
+            retry=Retry(ExponentialBackoff(cap=1, base=0.05), self.retries),
+            retry_on_error=[redis.ConnectionError, redis.TimeoutError]
+        )
+        return pool, client
     
     def connect(self):
         """建立 Redis 连接"""
         try:
             if not self._client:
-                self._client = redis.Redis(
-                    host=self.host,
-                    port=self.port,
-                    password=self.password if self.password else None,
-                    db=self.db,
-                    decode_responses=True
-                )
+                self._pool, self._client = self._create_client(decode_responses=True)
                 # 测试连接
                 self._client.ping()
                 print("Redis 连接成功")
@@ -41,23 +176,67 @@ class RedisUtil:
             print(f"Redis 连接失败: {e}")
             raise e
     
-    def get(self, key):
-        """获取键值"""
+    def connect_binary(self):
+        """建立不解码响应的 Redis 连接，用于读写二进制值"""
+        try:
+            if not self._binary_client:
+                self._binary_pool, self._binary_client = self._create_client(decode_responses=False)
+            return self._binary_client
+        except Exception as e:
+            print(f"Redis 连接失败: {e}")
+            raise e
+    
+    def _encode(self, value, codec):
+        return pack(value, codec, self.compression, self.compress_threshold)
+    
+    def get(self, key, codec=None):
+        """
+        获取键值
+        :param codec: 值编码方式，默认使用 REDIS_CODEC：text（字符串，不编码）、raw（二进制）、json、msgpack、pickle
+        """
         try:
+            codec = codec or self.codec
+            if codec != 'text':
+                client = self.connect_binary()
+                with instrumentation.track('redis', 'get', key) as op:
+                    data = client.get(key)
+                    if data is not None:
+                        op.bytes = len(data)
+                return unpack(data, codec)
             client = self.connect()
-            return client.get(key)
+            with instrumentation.track('redis', 'get', key) as op:
+                near_cache = self._near_cache
+                if near_cache and near_cache.matches(key):
+                    value = near_cache.get(key)
+                else:
+                    value = client.get(key)
+                if value is not None:
+                    op.bytes = len(value)
+            return value
         except Exception as e:
             print(f"获取键值失败: {e}")
             raise e
     
-    def set(self, key, value, expire_seconds=None):
-        """设置键值"""
+    def set(self, key, value, expire_seconds=None, codec=None):
+        """
+        设置键值
+        :param codec: 值编码方式，默认使用 REDIS_CODEC，非 text 时超过 REDIS_COMPRESS_THRESHOLD 字节的值会被压缩
+        """
         try:
-            client = self.connect()
-            if expire_seconds:
-                return client.set(key, value, ex=expire_seconds)
+            codec = codec or self.codec
+            if codec != 'text':
+                client = self.connect_binary()
+                value = self._encode(value, codec)
             else:
-                return client.set(key, value)
+                client = self.connect()
+            self._invalidate_near_cache([key])
+            with instrumentation.track('redis', 'set', key) as op:
+                if isinstance(value, (str, bytes)):
+                    op.bytes = len(value)
+                if expire_seconds:
+                    return client.set(key, value, ex=expire_seconds)
+                else:
+                    return client.set(key, value)
         except Exception as e:
             print(f"设置键值失败: {e}")
             raise e
@@ -66,16 +245,320 @@ class RedisUtil:
         """删除键"""
         try:
             client = self.connect()
-            return client.delete(key)
+            self._invalidate_near_cache([key])
+            with instrumentation.track('redis', 'delete', key):
+                return client.delete(key)
         except Exception as e:
             print(f"删除键失败: {e}")
             raise e
     
+    @contextmanager
+    def pipeline(self, flush_size=1000, transaction=False):
+        """
+        批量执行任意命令的管道，命令数达到 flush_size 时自动提交，退出时提交剩余命令
+        :param flush_size: 自动提交的命令数
+        :param transaction: 是否以 MULTI/EXEC 事务方式提交每一批
+        """
+        client = self.connect()
+        pipe = RedisPipeline(client.pipeline(transaction=transaction), flush_size)
+        try:
+            yield pipe
+            pipe.flush()
+        finally:
+            pipe.reset()
+    
+    def mget(self, keys, batch_size=1000, codec=None):
+        """
+        批量获取键值
+        :param keys: 键列表
+        :param batch_size: 单条 MGET 命令包含的键数，超出时分多条命令通过管道一次发送
+        :param codec: 值编码方式，默认使用 REDIS_CODEC
+        :return: 与 keys 顺序一致的值列表，不存在的键为 None
+        """
+        try:
+            keys = list(keys)
+            if not keys:
+                return []
+            codec = codec or self.codec
+            client = self.connect() if codec == 'text' else self.connect_binary()
+            with instrumentation.track('redis', 'mget', f"{len(keys)} keys") as op:
+                op.rows = len(keys)
+                if len(keys) <= batch_size:
+                    values = client.mget(keys)
+                else:
+                    pipe = client.pipeline(transaction=False)
+                    for chunk in _chunked(keys, batch_size):
+                        pipe.mget(chunk)
+                    values = [value for values in pipe.execute() for value in values]
+            if codec == 'text':
+                return values
+            return [unpack(value, codec) for value in values]
+        except Exception as e:
+            print(f"批量获取键值失败: {e}")
+            raise e
+    
+    def mset(self, mapping, expire_seconds=None, batch_size=1000, codec=None):
+        """
+        批量设置键值
+        :param mapping: 键值字典
+        :param expire_seconds: 过期时间，可以是统一的秒数，也可以是 {键: 秒数} 字典
+        :param batch_size: 每批命令数
+        :param codec: 值编码方式，默认使用 REDIS_CODEC
+        """
+        try:
+            items = list(mapping.items())
+            if not items:
+                return True
+            codec = codec or self.codec
+            if codec != 'text':
+                client = self.connect_binary()
+                items = [(key, self._encode(value, codec)) for key, value in items]
+            else:
+                client = self.connect()
+            self._invalidate_near_cache(mapping.keys())
+            with instrumentation.track('redis', 'mset', f"{len(items)} keys") as op:
+                op.rows = len(items)
+                pipe = client.pipeline(transaction=False)
+                if not expire_seconds:
+                    for chunk in _chunked(items, batch_size):
+                        pipe.mset(dict(chunk))
+                    pipe.execute()
+                    return True
+                per_key = isinstance(expire_seconds, dict)
+                for chunk in _chunked(items, batch_size):
+                    for key, value in chunk:
+                        ttl = expire_seconds.get(key) if per_key else expire_seconds
+                        if ttl:
+                            pipe.set(key, value, ex=ttl)
+                        else:
+                            pipe.set(key, value)
+                    pipe.execute()
+                return True
+        except Exception as e:
+            print(f"批量设置键值失败: {e}")
+            raise e
+    
+    def delete_many(self, keys, batch_size=1000):
+        """
+        批量删除键
+        :param keys: 键列表
+        :param batch_size: 单条 DEL 命令包含的键数
+        :return: 删除的键数量
+        """
+        try:
+            keys = list(keys)
+            if not keys:
+                return 0
+            client = self.connect()
+            self._invalidate_near_cache(keys)
+            with instrumentation.track('redis', 'delete_many', f"{len(keys)} keys") as op:
+                op.rows = len(keys)
+                pipe = client.pipeline(transaction=False)
+                for chunk in _chunked(keys, batch_size):
+                    pipe.delete(*chunk)
+                return sum(pipe.execute())
+        except Exception as e:
+            print(f"批量删除键失败: {e}")
+            raise e
+    
+    def scan_iter(self, pattern='*', count=1000, type_name=None):
+        """
+        使用 SCAN 游标遍历匹配的键，每次只返回一批，不会像 KEYS 一样阻塞 Redis
+        遍历期间键被修改时可能重复返回同一个键
+        :param pattern: 键匹配模式，如 'session:*'
+        :param count: 每次 SCAN 建议返回的键数
+        :param type_name: 仅返回该类型的键，如 'string'、'hash'（Redis 6+）
+        """
+        try:
+            client = self.connect()
+            cursor = 0
+            while True:
+                with instrumentation.track('redis', 'scan', pattern) as op:
+                    cursor, keys = client.scan(cursor, match=pattern, count=count, _type=type_name)
+                    op.rows = len(keys)
+                yield from keys
+                if not cursor:
+                    break
+        except Exception as e:
+            print(f"遍历键失败: {e}")
+            raise e
+    
+    def scan_hash(self, key, pattern='*', count=1000):
+        """
+        使用 HSCAN 遍历哈希的字段，适用于字段很多的大哈希
+        :param key: 哈希键名
+        :param pattern: 字段匹配模式
+        :param count: 每次 HSCAN 建议返回的字段数
+        :return: 生成器，每次返回 (字段, 值)
+        """
+        try:
+            client = self.connect()
+            cursor = 0
+            while True:
+                with instrumentation.track('redis', 'hscan', key) as op:
+                    cursor, fields = client.hscan(key, cursor, match=pattern, count=count)
+                    op.rows = len(fields)
+                yield from fields.items()
+                if not cursor:
+                    break
+        except Exception as e:
+            print(f"遍历哈希失败: {e}")
+            raise e
+    
+    def scan_set(self, key, pattern='*', count=1000):
+        """
+        使用 SSCAN 遍历集合的成员，适用于成员很多的大集合
+        :param key: 集合键名
+        :param pattern: 成员匹配模式
+        :param count: 每次 SSCAN 建议返回的成员数
+        """
+        try:
+            client = self.connect()
+            cursor = 0
+            while True:
+                with instrumentation.track('redis', 'sscan', key) as op:
+                    cursor, members = client.sscan(key, cursor, match=pattern, count=count)
+                    op.rows = len(members)
+                yield from members
+                if not cursor:
+                    break
+        except Exception as e:
+            print(f"遍历集合失败: {e}")
+            raise e
+    
+    def _apply_pattern(self, operation, pattern, add_commands, batch_size, count, interval):
+        """按 SCAN 结果分批通过管道执行命令，返回各批结果之和"""
+        client = self.connect()
+        total = 0
+        
+        def flush(keys):
+            self._invalidate_near_cache(keys)
+            with instrumentation.track('redis', operation, pattern) as op:
+                op.rows = len(keys)
+                pipe = client.pipeline(transaction=False)
+                add_commands(pipe, keys)
+                return sum(pipe.execute())
+        
+        batch = []
+        for key in self.scan_iter(pattern, count):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                total += flush(batch)
+                batch = []
+                # 批次之间让出 Redis，避免维护任务挤占正常请求
+                if interval:
+                    time.sleep(interval)
+        if batch:
+            total += flush(batch)
+        return total
+    
+    def delete_pattern(self, pattern, batch_size=500, count=1000, interval=0):
+        """
+        删除所有匹配的键：SCAN 遍历后分批 UNLINK（在后台线程释放内存，不阻塞 Redis）
+        :param pattern: 键匹配模式，如 'session:*'
+        :param batch_size: 每批删除的键数
+        :param count: 每次 SCAN 建议返回的键数
+        :param interval: 批次之间的休眠秒数
+        :return: 删除的键数量
+        """
+        try:
+            return self._apply_pattern('delete_pattern', pattern, lambda pipe, keys: pipe.unlink(*keys),
+                                       batch_size, count, interval)
+        except Exception as e:
+            print(f"按模式删除键失败: {e}")
+            raise e
+    
+    def expire_pattern(self, pattern, expire_seconds, batch_size=500, count=1000, interval=0):
+        """
+        为所有匹配的键设置过期时间：SCAN 遍历后分批通过管道发送 EXPIRE
+        :param pattern: 键匹配模式，如 'session:*'
+        :param expire_seconds: 过期秒数
+        :param batch_size: 每批设置的键数
+        :param count: 每次 SCAN 建议返回的键数
+        :param interval: 批次之间的休眠秒数
+        :return: 设置成功的键数量
+        """
+        def add_commands(pipe, keys):
+            for key in keys:
+                pipe.expire(key, expire_seconds)
+        
+        try:
+            return self._apply_pattern('expire_pattern', pattern, add_commands, batch_size, count, interval)
+        except Exception as e:
+            print(f"按模式设置过期时间失败: {e}")
+            raise e
+    
+    def enable_near_cache(self, max_size=10000, prefixes=None):
+        """
+        开启客户端缓存（需要 Redis 6+）：get 优先读取本地副本，服务端通过 CLIENT TRACKING 推送失效消息
+        :param max_size: 本地缓存的最大条目数
+        :param prefixes: 仅对这些前缀的键启用本地缓存（BCAST 模式），默认全部键
+        """
+        try:
+            if not self._near_cache:
+                near_cache = RedisNearCache(
+                    {
+                        'host': self.host,
+                        'port': self.port,
+                        'password': self.password if self.password else None,
+                        'db': self.db,
+                        'decode_responses': True,
+                        'socket_timeout': self.socket_timeout,
+                        'socket_connect_timeout': self.socket_connect_timeout,
+                        'socket_keepalive': self.socket_keepalive
+                    },
+                    max_size=max_size,
+                    prefixes=prefixes,
+                    # 读连接池与普通连接使用相同的连接数上限、等待超时、健康检查和重试配置
+                    create_client=lambda on_connect: self._create_client(True, on_connect)
+                )
+                near_cache.start()
+                self._near_cache = near_cache
+                print("Redis 客户端缓存已开启")
+            return self._near_cache
+        except Exception as e:
+            print(f"开启 Redis 客户端缓存失败: {e}")
+            raise e
+    
+    def disable_near_cache(self):
+        """关闭客户端缓存"""
+        if self._near_cache:
+            self._near_cache.close()
+            self._near_cache = None
+    
+    def near_cache_stats(self):
+        """获取客户端缓存命中统计"""
+        if not self._near_cache:
+            return None
+        return self._near_cache.stats()
+    
+    def _invalidate_near_cache(self, keys):
+        if self._near_cache:
+            self._near_cache.invalidate(keys)
+    
+    def pool_stats(self):
+        """获取连接池使用情况（已建立、空闲、使用中的连接数以及等待次数）"""
+        if not self._pool:
+            return None
+        stats = self._pool.stats()
+        if self._binary_pool:
+            stats['binary'] = self._binary_pool.stats()
+        return stats
+    
     def close(self):
         """关闭 Redis 连接"""
+        self.disable_near_cache()
         if self._client:
             self._client.close()
+            self._pool.disconnect()
+            self._client = None
+            self._pool = None
             print("Redis 连接已关闭")
+        if self._binary_client:
+            self._binary_client.close()
+            self._binary_pool.disconnect()
+            self._binary_client = None
+            self._binary_pool = None
 
 # 创建单例实例
 redis_util = RedisUtil()
\ No newline at end of file
@@ -1,10 +1,15 @@
 import sqlite3
 import os
 from dotenv import load_dotenv
+from ..config import config
+from ..instrumentation import instrumentation
 
 # 加载环境变量
 load_dotenv()
 
+# 连接后按顺序执行的 PRAGMA：先设置 busy_timeout，切换 WAL 时遇到锁会等待而不是立即失败
+PRAGMAS = ('busy_timeout', 'journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store')
+
 class SQLiteUtil:
     _instance = None
     _connection = None
@@ -18,29 +23,50 @@ class SQLiteUtil:
         if not hasattr(self, 'initialized'):
             self.initialized = True
             self.db_path = os.getenv('SQLITE_PATH', './database.sqlite')
+            self.pragmas = {name: config['sqlite'][name] for name in PRAGMAS if config['sqlite'][name]}
     
     def connect(self):
         """建立 SQLite 数据库连接"""
         try:
             if not self._connection:
-                self._connection = sqlite3.connect(self.db_path)
-                self._connection.row_factory = sqlite3.Row  # 使结果可以通过列名访问
+                connection = sqlite3.connect(self.db_path)
+                connection.row_factory = sqlite3.Row  # 使结果可以通过列名访问
+                try:
+                    self._apply_pragmas(connection)
+                except Exception:
+                    connection.close()
+                    raise
+                self._connection = connection
                 print("SQLite 连接成功")
             return self._connection
         except Exception as e:
             print(f"SQLite 连接失败: {e}")
             raise e
     
+    def _apply_pragmas(self, connection):
+        """执行配置的 PRAGMA（SQLITE_JOURNAL_MODE、SQLITE_SYNCHRONOUS 等）"""
+        for name, value in self.pragmas.items():
+            value = str(value).strip()
+            # PRAGMA 不支持参数绑定，只允许数字和关键字
+            if not value.lstrip('-').isalnum():
+                raise ValueError(f"无效的 PRAGMA 值: {name}={value}")
+            result = connection.execute(f"PRAGMA {name} = {value}").fetchone()
+            # journal_mode 返回实际生效的模式，内存数据库固定为 memory，其他不支持 WAL 的情况会保持原模式
+            if name == 'journal_mode' and result and str(result[0]).lower() not in (value.lower(), 'memory'):
+                print(f"SQLite journal_mode 设置为 {value} 失败，当前为 {result[0]}")
+    
     def execute_query(self, sql, params=None):
         """执行查询语句"""
         try:
             connection = self.connect()
             cursor = connection.cursor()
-            if params:
-                cursor.execute(sql, params)
-            else:
-                cursor.execute(sql)
-            result = cursor.fetchall()
+            with instrumentation.track('sqlite', 'query', sql) as op:
+                if params:
+                    cursor.execute(sql, params)
+                else:
+                    cursor.execute(sql)
+                result = cursor.fetchall()
+                op.rows = len(result)
             return [dict(row) for row in result]
         except Exception as e:
             print(f"查询执行失败: {e}")
@@ -49,16 +75,62 @@ class SQLiteUtil:
             if cursor:
                 cursor.close()
     
+    def scan_table(self, table, key_column, batch_size=1000, where=None, params=None,
+                   start_after=None, columns='*'):
+        """
+        按主键范围（keyset 分页）遍历整张表，每页耗时与页码无关
+        :param table: 表名
+        :param key_column: 唯一且有索引的排序列，通常为主键或 rowid
+        :param batch_size: 每批行数
+        :param where: 额外的过滤条件（不含 WHERE 关键字），如 'status = ?'
+        :param params: where 条件的参数，可以是序列（? 占位符）或字典（:name 占位符）
+        :param start_after: 从该键值之后开始遍历，用于断点续跑
+        :param columns: 查询列，默认全部列；结果中总是包含 key_column
+        :return: 生成器，每次返回一批行（字典列表），最后一行的 key_column 即续跑位置
+        """
+        key = '"' + key_column.replace('"', '""') + '"'
+        # 单独查询排序列：rowid 等隐藏列不在 * 的结果中
+        base_sql = f'SELECT {key} AS {key}, {columns} FROM "' + table.replace('"', '""') + '" WHERE '
+        conditions = [f"({where})"] if where else []
+        named = isinstance(params, dict)
+        last_key = start_after
+        while True:
+            page_conditions = list(conditions)
+            if named:
+                page_params = dict(params)
+                if last_key is not None:
+                    page_conditions.append(f"{key} > :_scan_last_key")
+                    page_params['_scan_last_key'] = last_key
+                limit = ':_scan_limit'
+                page_params['_scan_limit'] = batch_size
+            else:
+                page_params = list(params or [])
+                if last_key is not None:
+                    page_conditions.append(f"{key} > ?")
+                    page_params.append(last_key)
+                limit = '?'
+                page_params.append(batch_size)
+            sql = base_sql + (' AND '.join(page_conditions) or '1 = 1') + f" ORDER BY {key} LIMIT {limit}"
+            rows = self.execute_query(sql, page_params)
+            if not rows:
+                return
+            yield rows
+            if len(rows) < batch_size:
+                return
+            last_key = rows[-1][key_column]
+    
     def execute_update(self, sql, params=None):
         """执行更新语句（INSERT, UPDATE, DELETE）"""
         try:
             connection = self.connect()
             cursor = connection.cursor()
-            if params:
-                result = cursor.execute(sql, params)
-            else:
-                result = cursor.execute(sql)
-            connection.commit()
+            with instrumentation.track('sqlite', 'update', sql) as op:
+                if params:
+                    result = cursor.execute(sql, params)
+                else:
+                    result = cursor.execute(sql)
+                connection.commit()
+                op.rows = result.rowcount
             return result.rowcount
         except Exception as e:
             print(f"更新执行失败: {e}")
@@ -0,0 +1,250 @@
+import time
+import threading
+from functools import wraps
+from collections import OrderedDict
+from .redis import redis_util
+from ..config import config
+
+class _Call:
+    """同一个键正在进行的计算，其他调用方等待其结果"""
+    __slots__ = ('event', 'value', 'error')
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+class TieredCache:
+    """
+    两级缓存：进程内 LRU + redis_util
+    - 同一个键未命中时只有一个调用方执行计算，其余调用方等待结果（防击穿）
+    - 过期后的 stale_ttl 秒内先返回旧值，并在后台线程刷新（stale-while-revalidate）
+    """
+    
+    def __init__(self, max_size=1024, ttl=60, stale_ttl=0, local_ttl=None,
+                 namespace='th_cnd_utils:cache', use_redis=True, codec=None):
+        """
+        :param max_size: 进程内缓存的最大条目数
+        :param ttl: 默认新鲜期（秒）
+        :param stale_ttl: 新鲜期过后仍可返回旧值的时间（秒）
+        :param local_ttl: 进程内缓存的最长保留时间，用于限制多进程间的不一致，默认等于 ttl
+        :param namespace: Redis 键前缀
+        :param use_redis: 是否启用 Redis 二级缓存
+        :param codec: Redis 中值的编码方式，默认使用 REDIS_CACHE_CODEC（json）；
+                      json 编码下元组变为列表、datetime 等类型变为字符串，pickle 只应在信任 Redis 中全部数据时使用
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.local_ttl = local_ttl
+        self.namespace = namespace
+        self.use_redis = use_redis
+        self.codec = codec or config['redis']['cache_codec']
+        self._entries = OrderedDict()  # key -> (value, fresh_until, stale_until, local_until)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'local_hits': 0,
+            'redis_hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'computes': 0,
+            'redis_errors': 0
+        }
+    
+    def _redis_key(self, key):
+        return f"{self.namespace}:{key}"
+    
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+    
+    def _get_local(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if now >= entry[2] or now >= entry[3]:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+    
+    def _set_local(self, key, value, fresh_until, stale_until, ttl):
+        local_ttl = self.local_ttl if self.local_ttl is not None else ttl
+        local_until = time.time() + local_ttl
+        with self._lock:
+            self._entries[key] = (value, fresh_until, stale_until, local_until)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def _get_redis(self, key):
+        if not self.use_redis:
+            return None
+        try:
+            return redis_util.get(self._redis_key(key), codec=self.codec)
+        except Exception:
+            # Redis 不可用时退化为仅使用进程内缓存
+            self._count('redis_errors')
+            return None
+    
+    def _set_redis(self, key, envelope, expire_seconds):
+        if not self.use_redis:
+            return
+        try:
+            redis_util.set(self._redis_key(key), envelope, max(int(expire_seconds + 0.999), 1),
+                           codec=self.codec)
+        except Exception:
+            self._count('redis_errors')
+    
+    def _get_entry(self, key):
+        """依次查询进程内缓存和 Redis，返回 (value, fresh_until, stale_until) 或 None"""
+        entry = self._get_local(key)
+        if entry is not None:
+            self._count('local_hits')
+            return entry[:3]
+        envelope = self._get_redis(key)
+        if envelope is not None:
+            value, fresh_until, stale_until = envelope
+            if time.time() < stale_until:
+                self._count('redis_hits')
+                self._set_local(key, value, fresh_until, stale_until, max(fresh_until - time.time(), 0))
+                return envelope
+        self._count('misses')
+        return None
+    
+    def get(self, key, default=None):
+        """获取缓存值（包括仍在 stale 窗口内的旧值）"""
+        entry = self._get_entry(key)
+        return entry[0] if entry is not None else default
+    
+    def set(self, key, value, ttl=None):
+        """写入两级缓存"""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        fresh_until = now + ttl
+        stale_until = fresh_until + self.stale_ttl
+        self._set_local(key, value, fresh_until, stale_until, ttl)
+        self._set_redis(key, (value, fresh_until, stale_until), ttl + self.stale_ttl)
+    
+    def delete(self, key):
+        """删除两级缓存中的键"""
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.use_redis:
+            try:
+                redis_util.delete(self._redis_key(key))
+            except Exception:
+                self._count('redis_errors')
+    
+    def clear_local(self):
+        """清空进程内缓存"""
+        with self._lock:
+            self._entries.clear()
+    
+    def get_or_compute(self, key, func, ttl=None):
+        """
+        获取缓存值，未命中时调用 func 计算并写入缓存
+        :param key: 缓存键
+        :param func: 无参计算函数
+        :param ttl: 新鲜期（秒），默认使用实例的 ttl
+        """
+        entry = self._get_entry(key)
+        if entry is not None:
+            value, fresh_until, stale_until = entry
+            now = time.time()
+            if now < fresh_until:
+                return value
+            if now < stale_until:
+                self._count('stale_hits')
+                self._refresh_in_background(key, func, ttl)
+                return value
+        return self._compute(key, func, ttl)
+    
+    def _compute(self, key, func, ttl):
+        """单飞计算：同一个键同时只有一个调用方执行 func"""
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        
+        try:
+            self._count('computes')
+            call.value = func()
+            self.set(key, call.value, ttl)
+            return call.value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.event.set()
+    
+    def _refresh_in_background(self, key, func, ttl):
+        with self._lock:
+            if key in self._inflight:
+                return
+        
+        def refresh():
+            try:
+                self._compute(key, func, ttl)
+            except Exception as e:
+                print(f"后台刷新缓存失败: {e}")
+        
+        threading.Thread(target=refresh, daemon=True).start()
+    
+    def stats(self):
+        """缓存命中统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+            stats['max_size'] = self.max_size
+        return stats
+
+def _default_key(func, args, kwargs):
+    return f"{func.__module__}.{func.__qualname__}:{args!r}:{sorted(kwargs.items())!r}"
+
+def cached(ttl=60, key=None, cache=None, stale_ttl=0, max_size=1024, use_redis=True, codec=None):
+    """
+    两级缓存装饰器
+    :param ttl: 新鲜期（秒）
+    :param key: 缓存键，可以是格式化字符串（如 'user:{0}' 或 'user:{user_id}'）或接收函数参数的函数，
+                默认由函数名和参数生成
+    :param cache: 使用的 TieredCache 实例，默认为每个函数单独创建
+    :param stale_ttl: 新鲜期过后仍可返回旧值并在后台刷新的时间（秒）
+    :param max_size: 未指定 cache 时，进程内缓存的最大条目数
+    :param use_redis: 未指定 cache 时，是否启用 Redis 二级缓存
+    :param codec: 未指定 cache 时，Redis 中值的编码方式，默认使用 REDIS_CACHE_CODEC
+    """
+    def decorator(func):
+        tiered_cache = cache or TieredCache(max_size=max_size, ttl=ttl, stale_ttl=stale_ttl, use_redis=use_redis,
+                                           codec=codec)
+        
+        def make_key(*args, **kwargs):
+            if key is None:
+                return _default_key(func, args, kwargs)
+            if callable(key):
+                return key(*args, **kwargs)
+            return key.format(*args, **kwargs)
+        
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return tiered_cache.get_or_compute(make_key(*args, **kwargs), lambda: func(*args, **kwargs), ttl)
+        
+        def invalidate(*args, **kwargs):
+            """删除指定参数对应的缓存"""
+            tiered_cache.delete(make_key(*args, **kwargs))
+        
+        wrapper.cache = tiered_cache
+        wrapper.invalidate = invalidate
+        return wrapper
+    return decorator
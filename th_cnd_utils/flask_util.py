@@ -5,6 +5,7 @@ from functools import wraps
 from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 from dotenv import load_dotenv
+from .instrumentation import instrumentation
 
 # 加载环境变量
 load_dotenv()
@@ -205,6 +206,17 @@ class FlaskUtil:
             return decorated_function
         return decorator
     
+    def register_metrics_endpoint(self, rule='/metrics'):
+        """
+        注册 Prometheus 格式的统计数据接口
+        :param rule: 路由规则
+        """
+        def metrics():
+            return Response(instrumentation.render_prometheus(), mimetype='text/plain; version=0.0.4')
+        
+        self.app.add_url_rule(rule, 'th_cnd_utils_metrics', metrics, methods=['GET'])
+        return metrics
+    
     def get_client_ip(self):
         """
         获取客户端IP地址
@@ -0,0 +1,174 @@
+import time
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from .config import config
+
+logger = logging.getLogger('th_cnd_utils.instrumentation')
+
+# 延迟直方图的桶边界（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class _Operation:
+    """一次操作的附加统计信息，由调用方填写"""
+    __slots__ = ('rows', 'bytes')
+    
+    def __init__(self):
+        self.rows = None
+        self.bytes = None
+
+class Instrumentation:
+    """各数据库/云服务工具共享的耗时统计与慢操作日志"""
+    _instance = None
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(Instrumentation, cls).__new__(cls)
+        return cls._instance
+    
+    def __init__(self):
+        if not hasattr(self, 'initialized'):
+            self.initialized = True
+            self.enabled = config['metrics']['enabled']
+            self.slow_threshold_ms = config['metrics']['slow_threshold_ms']
+            self.buckets = DEFAULT_BUCKETS
+            self._metrics = {}  # (component, operation) -> 统计数据
+            self._hooks = []
+            self._lock = threading.Lock()
+    
+    def add_hook(self, hook):
+        """
+        注册自定义钩子，每次操作结束后调用
+        :param hook: 接收一个事件字典的函数，字段包括 component/operation/duration/rows/bytes/error/statement
+        """
+        self._hooks.append(hook)
+    
+    def remove_hook(self, hook):
+        """移除自定义钩子"""
+        if hook in self._hooks:
+            self._hooks.remove(hook)
+    
+    @contextmanager
+    def track(self, component, operation, statement=None):
+        """
+        统计一次操作的耗时
+        :param component: 组件名，如 mysql、redis
+        :param operation: 操作名，如 query、get
+        :param statement: 语句或键名，仅用于慢操作日志
+        :return: 可设置 rows/bytes 属性的记录对象
+        """
+        record = _Operation()
+        if not self.enabled:
+            yield record
+            return
+        error = None
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.observe(component, operation, time.perf_counter() - start,
+                         rows=record.rows, nbytes=record.bytes, error=error, statement=statement)
+    
+    def observe(self, component, operation, duration, rows=None, nbytes=None, error=None, statement=None):
+        """记录一次已完成的操作"""
+        key = (component, operation)
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = {
+                    'count': 0,
+                    'errors': 0,
+                    'sum': 0.0,
+                    'buckets': [0] * len(self.buckets),
+                    'rows': 0,
+                    'bytes': 0
+                }
+            metric['count'] += 1
+            metric['sum'] += duration
+            index = bisect_left(self.buckets, duration)
+            if index < len(self.buckets):
+                metric['buckets'][index] += 1
+            if error is not None:
+                metric['errors'] += 1
+            if rows and rows > 0:
+                metric['rows'] += rows
+            if nbytes:
+                metric['bytes'] += nbytes
+        
+        duration_ms = duration * 1000
+        if duration_ms >= self.slow_threshold_ms:
+            text = str(statement)[:1000] if statement is not None else ''
+            logger.warning(f"慢操作 {component}.{operation} 耗时 {duration_ms:.1f}ms: {text}")
+        
+        if self._hooks:
+            event = {
+                'component': component,
+                'operation': operation,
+                'duration': duration,
+                'rows': rows,
+                'bytes': nbytes,
+                'error': error,
+                'statement': statement
+            }
+            for hook in list(self._hooks):
+                try:
+                    hook(event)
+                except Exception as e:
+                    logger.error(f"统计钩子执行失败: {e}")
+    
+    def snapshot(self):
+        """获取当前统计数据的副本"""
+        with self._lock:
+            return {
+                f"{component}.{operation}": {
+                    'count': metric['count'],
+                    'errors': metric['errors'],
+                    'sum': metric['sum'],
+                    'avg': metric['sum'] / metric['count'] if metric['count'] else 0.0,
+                    'rows': metric['rows'],
+                    'bytes': metric['bytes'],
+                    'buckets': dict(zip(self.buckets, metric['buckets']))
+                }
+                for (component, operation), metric in self._metrics.items()
+            }
+    
+    def reset(self):
+        """清空统计数据"""
+        with self._lock:
+            self._metrics.clear()
+    
+    def render_prometheus(self, prefix='th_cnd_utils'):
+        """导出 Prometheus 文本格式的统计数据"""
+        with self._lock:
+            items = sorted((key, dict(metric, buckets=list(metric['buckets'])))
+                           for key, metric in self._metrics.items())
+        lines = [
+            f"# HELP {prefix}_operation_duration_seconds 操作耗时",
+            f"# TYPE {prefix}_operation_duration_seconds histogram"
+        ]
+        for (component, operation), metric in items:
+            labels = f'component="{component}",operation="{operation}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, metric['buckets']):
+                cumulative += count
+                lines.append(f'{prefix}_operation_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_operation_duration_seconds_bucket{{{labels},le="+Inf"}} {metric["count"]}')
+            lines.append(f'{prefix}_operation_duration_seconds_sum{{{labels}}} {metric["sum"]}')
+            lines.append(f'{prefix}_operation_duration_seconds_count{{{labels}}} {metric["count"]}')
+        for name, field, help_text in (
+            ('operation_errors_total', 'errors', '失败次数'),
+            ('operation_rows_total', 'rows', '处理行数'),
+            ('operation_bytes_total', 'bytes', '传输字节数')
+        ):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for (component, operation), metric in items:
+                lines.append(f'{prefix}_{name}{{component="{component}",operation="{operation}"}} {metric[field]}')
+        return '\n'.join(lines) + '\n'
+
+# 创建单例实例
+instrumentation = Instrumentation()
@@ -0,0 +1,144 @@
+import json
+import gzip
+import zlib
+import pickle
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # 可选依赖
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖
+    zstandard = None
+
+def _to_bytes(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    raise TypeError(f"raw 编码只支持 bytes/str，实际类型: {type(value).__name__}")
+
+def _json_dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+
+def _msgpack_dumps(value):
+    if msgpack is None:
+        raise ImportError("msgpack 编码需要安装 msgpack: pip install msgpack")
+    return msgpack.packb(value, use_bin_type=True)
+
+def _msgpack_loads(data):
+    if msgpack is None:
+        raise ImportError("msgpack 解码需要安装 msgpack: pip install msgpack")
+    return msgpack.unpackb(data, raw=False)
+
+# 序列化方式：名称 -> (编码函数, 解码函数, content_type)
+SERIALIZERS = {
+    'raw': (_to_bytes, bytes, 'application/octet-stream'),
+    'json': (_json_dumps, lambda data: json.loads(data.decode('utf-8')), 'application/json'),
+    'msgpack': (_msgpack_dumps, _msgpack_loads, 'application/msgpack'),
+    'pickle': (lambda value: pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), pickle.loads,
+               'application/python-pickle')
+}
+
+def _lz4_compress(data):
+    if lz4_frame is None:
+        raise ImportError("lz4 压缩需要安装 lz4: pip install lz4")
+    return lz4_frame.compress(data)
+
+def _lz4_decompress(data):
+    if lz4_frame is None:
+        raise ImportError("lz4 解压需要安装 lz4: pip install lz4")
+    return lz4_frame.decompress(data)
+
+def _zstd_compress(data):
+    if zstandard is None:
+        raise ImportError("zstd 压缩需要安装 zstandard: pip install zstandard")
+    return zstandard.ZstdCompressor().compress(data)
+
+def _zstd_decompress(data):
+    if zstandard is None:
+        raise ImportError("zstd 解压需要安装 zstandard: pip install zstandard")
+    return zstandard.ZstdDecompressor().decompress(data)
+
+# 压缩方式：名称 -> (编号, 压缩函数, 解压函数)，编号用于 Redis 值的头部标记
+COMPRESSORS = {
+    'zlib': (1, zlib.compress, zlib.decompress),
+    'gzip': (2, gzip.compress, gzip.decompress),
+    'lz4': (3, _lz4_compress, _lz4_decompress),
+    'zstd': (4, _zstd_compress, _zstd_decompress)
+}
+_COMPRESSORS_BY_ID = {item[0]: (name,) + item[1:] for name, item in COMPRESSORS.items()}
+
+def _serializer(codec):
+    try:
+        return SERIALIZERS[codec]
+    except KeyError:
+        raise ValueError(f"不支持的编码方式: {codec}，可选: {', '.join(SERIALIZERS)}")
+
+def _compressor(compression):
+    try:
+        return COMPRESSORS[compression]
+    except KeyError:
+        raise ValueError(f"不支持的压缩方式: {compression}，可选: {', '.join(COMPRESSORS)}")
+
+def serialize(value, codec):
+    """按指定编码方式将值序列化为 bytes"""
+    return _serializer(codec)[0](value)
+
+def deserialize(data, codec):
+    """按指定编码方式将 bytes 反序列化"""
+    return _serializer(codec)[1](data)
+
+def content_type(codec):
+    """编码方式对应的 content_type"""
+    return _serializer(codec)[2]
+
+def compress(data, compression):
+    """压缩 bytes"""
+    return _compressor(compression)[1](data)
+
+def decompress(data, compression):
+    """解压 bytes"""
+    return _compressor(compression)[2](data)
+
+def pack(value, codec, compression=None, threshold=1024):
+    """
+    序列化并在超过阈值时压缩，结果首字节标记压缩方式（0 表示未压缩），可由 unpack 自描述地还原；
+    raw 编码原样保存，不加标记、不压缩，与其他客户端读写的二进制值保持一致
+    :param value: 要编码的值
+    :param codec: 编码方式：raw/json/msgpack/pickle
+    :param compression: 压缩方式：zlib/gzip/lz4/zstd，None 表示不压缩
+    :param threshold: 序列化后达到该字节数才压缩
+    """
+    data = serialize(value, codec)
+    if codec == 'raw':
+        return data
+    if compression and len(data) >= threshold:
+        compression_id, compress_func, _ = _compressor(compression)
+        compressed = compress_func(data)
+        # 压缩无收益时保留原始数据
+        if len(compressed) < len(data):
+            return bytes((compression_id,)) + compressed
+    return b'\x00' + data
+
+def unpack(data, codec):
+    """还原 pack 的结果"""
+    if data is None:
+        return None
+    if codec == 'raw':
+        return bytes(data)
+    flag, payload = data[0], data[1:]
+    if flag:
+        try:
+            _, _, decompress_func = _COMPRESSORS_BY_ID[flag]
+        except KeyError:
+            raise ValueError(f"未知的压缩标记: {flag}")
+        payload = decompress_func(payload)
+    return deserialize(payload, codec)
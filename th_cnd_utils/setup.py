@@ -42,6 +42,7 @@ setup(
     package_data={
         "th_cnd_utils": [
             "examples/*.py",
+            "benchmarks/*.py",
         ],
     },
 )
\ No newline at end of file
@@ -23,6 +23,9 @@ def test_module_imports():
     print("\n=== 测试模块导入 ===")
     modules_to_test = [
         ("mysql_util", "from th_cnd_utils import mysql_util"),
+        ("async_mysql_util", "from th_cnd_utils import async_mysql_util"),
+        ("async_redis_util", "from th_cnd_utils import async_redis_util"),
+        ("async_rabbitmq_util", "from th_cnd_utils import async_rabbitmq_util"),
         ("redis_util", "from th_cnd_utils import redis_util"),
         ("rabbitmq_util", "from th_cnd_utils import rabbitmq_util"),
         ("sqlite_util", "from th_cnd_utils import sqlite_util"),
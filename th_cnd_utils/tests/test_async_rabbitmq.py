@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+异步 RabbitMQ 测试
+需要本地 RabbitMQ（RABBITMQ_HOST/RABBITMQ_PORT），无法连接时跳过
+"""
+
+import asyncio
+import socket
+import uuid
+
+import pytest
+
+from th_cnd_utils import async_rabbitmq_util
+
+
+def _broker_available():
+    try:
+        socket.create_connection((async_rabbitmq_util.host, async_rabbitmq_util.port), timeout=1).close()
+        return True
+    except OSError:
+        return False
+
+
+pytestmark = pytest.mark.skipif(not _broker_available(), reason='RabbitMQ 不可用')
+
+
+def _run(test):
+    """在新的事件循环中运行测试，结束后删除测试队列并关闭连接"""
+    queue = 'th_cnd_utils.test.' + uuid.uuid4().hex
+    
+    async def main():
+        try:
+            await test(queue)
+        finally:
+            if async_rabbitmq_util._channel is not None:
+                await async_rabbitmq_util._channel.queue_delete(queue)
+            await async_rabbitmq_util.close()
+    
+    asyncio.run(main())
+
+
+async def _wait(condition, timeout=10):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+def test_publish_is_confirmed():
+    async def test(queue):
+        await async_rabbitmq_util.send_message(queue, {'id': 0}, codec='json')
+        assert await async_rabbitmq_util.publish_batch(queue, [{'id': i} for i in range(1, 100)], codec='json') == 99
+        # 发送在服务端确认后才返回，消息此时已全部入队
+        declared = await async_rabbitmq_util._channel.declare_queue(queue, passive=True)
+        assert declared.declaration_result.message_count == 100
+    
+    _run(test)
+
+
+def test_concurrency_is_bounded():
+    async def test(queue):
+        active = 0
+        max_active = 0
+        done = []
+        
+        async def handle(message_info):
+            nonlocal active, max_active
+            active += 1
+            max_active = max(max_active, active)
+            await asyncio.sleep(0.05)
+            active -= 1
+            done.append(message_info['body'])
+        
+        await async_rabbitmq_util.publish_batch(queue, list(range(20)), codec='json')
+        await async_rabbitmq_util.consume_messages(queue, handle, auto_ack=True, prefetch_count=20, concurrency=3)
+        assert await _wait(lambda: len(done) == 20)
+        assert sorted(done) == list(range(20))
+        assert max_active == 3
+    
+    _run(test)
+
+
+def test_consumer_recovers_after_reconnect():
+    async def test(queue):
+        received = []
+        
+        async def handle(message_info):
+            received.append(message_info['body'])
+        
+        await async_rabbitmq_util.consume_messages(queue, handle, auto_ack=True)
+        await async_rabbitmq_util.send_message(queue, 'before', codec='json')
+        assert await _wait(lambda: received == ['before'])
+        
+        # 模拟连接中断，RobustConnection 重连后恢复通道、队列和消费者
+        connection = async_rabbitmq_util._connection
+        reconnected = asyncio.Event()
+        connection.reconnect_callbacks.add(lambda *args: reconnected.set())
+        await connection.transport.connection.close(ConnectionResetError('连接中断'))
+        await asyncio.wait_for(reconnected.wait(), timeout=30)
+        
+        await async_rabbitmq_util.send_message(queue, 'after', codec='json')
+        assert await _wait(lambda: received == ['before', 'after'])
+    
+    _run(test)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+MySQL 连接池测试：使用模拟连接，不需要 MySQL 服务
+"""
+
+import threading
+
+import pytest
+from pymysql.constants import SERVER_STATUS
+
+from th_cnd_utils.db import mysql
+from th_cnd_utils.db.mysql import MySQLConnectionPool
+
+
+class FakeConnection:
+    fail_ping = False
+    fail_rollback = False
+    
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.open = True
+        self.server_status = SERVER_STATUS.SERVER_STATUS_AUTOCOMMIT
+        self.pings = 0
+        self.rollbacks = 0
+    
+    def ping(self, reconnect=True):
+        self.pings += 1
+        if self.fail_ping:
+            raise OSError('连接已断开')
+    
+    def begin(self):
+        self.server_status |= SERVER_STATUS.SERVER_STATUS_IN_TRANS
+    
+    def rollback(self):
+        self.rollbacks += 1
+        if self.fail_rollback:
+            raise OSError('连接已断开')
+        self.server_status &= ~SERVER_STATUS.SERVER_STATUS_IN_TRANS
+    
+    def close(self):
+        self.open = False
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(mysql.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.fixture
+def created(monkeypatch):
+    created = []
+    
+    def connect(**kwargs):
+        connection = FakeConnection(**kwargs)
+        created.append(connection)
+        return connection
+    
+    monkeypatch.setattr(mysql.pymysql, 'connect', connect)
+    return created
+
+
+def test_fill_and_reuse(created, clock):
+    pool = MySQLConnectionPool({'host': 'db'}, min_size=2, max_size=3)
+    pool.fill()
+    assert len(created) == 2
+    assert created[0].kwargs == {'host': 'db'}
+    
+    connection = pool.acquire()
+    pool.release(connection)
+    assert pool.acquire() is connection
+    assert len(created) == 2
+    assert pool.stats() == {'size': 2, 'idle': 1, 'in_use': 1, 'max_size': 3}
+
+
+def test_ping_only_after_idle_interval(created, clock):
+    pool = MySQLConnectionPool({}, min_size=0, ping_interval=30)
+    connection = pool.acquire()
+    pool.release(connection)
+    clock.now += 5
+    assert pool.acquire() is connection
+    assert connection.pings == 0
+    pool.release(connection)
+    clock.now += 31
+    assert pool.acquire() is connection
+    assert connection.pings == 1
+
+
+def test_failed_ping_replaces_connection(created, clock):
+    pool = MySQLConnectionPool({}, min_size=0, ping_interval=0)
+    connection = pool.acquire()
+    pool.release(connection)
+    connection.fail_ping = True
+    replacement = pool.acquire()
+    assert replacement is not connection
+    assert not connection.open
+    assert pool.stats()['size'] == 1
+
+
+def test_recycle(created, clock):
+    pool = MySQLConnectionPool({}, min_size=0, recycle=60)
+    connection = pool.acquire()
+    pool.release(connection)
+    clock.now += 61
+    replacement = pool.acquire()
+    assert replacement is not connection
+    assert not connection.open
+    assert pool.stats()['size'] == 1
+
+
+def test_waits_for_release_when_full(created):
+    pool = MySQLConnectionPool({}, min_size=0, max_size=1, timeout=5)
+    connection = pool.acquire()
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(pool.acquire()))
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive()
+    pool.release(connection)
+    waiter.join(5)
+    assert result == [connection]
+    assert len(created) == 1
+
+
+def test_acquire_timeout(created):
+    pool = MySQLConnectionPool({}, min_size=0, max_size=1)
+    pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+    assert pool.stats()['size'] == 1
+
+
+def test_failed_connect_frees_slot(created, monkeypatch):
+    pool = MySQLConnectionPool({}, min_size=0, max_size=1)
+    
+    def refuse(**kwargs):
+        raise OSError('连接被拒绝')
+    
+    monkeypatch.setattr(mysql.pymysql, 'connect', refuse)
+    with pytest.raises(OSError):
+        pool.acquire()
+    assert pool.stats()['size'] == 0
+
+
+def test_release_rolls_back_open_transaction(created):
+    pool = MySQLConnectionPool({}, min_size=0)
+    connection = pool.acquire()
+    # 自动提交模式下的普通语句执行后不需要回滚
+    pool.release(connection)
+    assert connection.rollbacks == 0
+    
+    connection = pool.acquire()
+    connection.begin()
+    pool.release(connection)
+    assert connection.rollbacks == 1
+    assert pool.stats()['idle'] == 1
+
+
+def test_release_discards_connection_when_rollback_fails(created):
+    pool = MySQLConnectionPool({}, min_size=0)
+    connection = pool.acquire()
+    connection.begin()
+    connection.fail_rollback = True
+    pool.release(connection)
+    assert not connection.open
+    assert pool.stats()['size'] == 0
+
+
+def test_discard(created):
+    pool = MySQLConnectionPool({}, min_size=0)
+    connection = pool.acquire()
+    pool.release(connection, discard=True)
+    assert not connection.open
+    assert pool.stats() == {'size': 0, 'idle': 0, 'in_use': 0, 'max_size': 10}
+
+
+def test_close(created):
+    pool = MySQLConnectionPool({}, min_size=2)
+    pool.fill()
+    in_use = pool.acquire()
+    pool.close()
+    assert [connection.open for connection in created if connection is not in_use] == [False]
+    assert in_use.open
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+    # 关闭后归还的连接直接关闭
+    pool.release(in_use)
+    assert not in_use.open
+    assert pool.stats()['size'] == 0
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Redis 客户端缓存测试
+需要本地 Redis 6+（REDIS_HOST/REDIS_PORT），无法连接时跳过
+"""
+
+import time
+import uuid
+
+import pytest
+import redis
+
+from th_cnd_utils import redis_util
+
+PREFIX = 'th_cnd_utils:test:near_cache:'
+
+
+def _server():
+    client = redis.Redis(host=redis_util.host, port=redis_util.port, db=redis_util.db,
+                         password=redis_util.password or None, decode_responses=True,
+                         socket_connect_timeout=1, socket_timeout=5)
+    try:
+        client.ping()
+    except redis.RedisError:
+        return None
+    return client
+
+
+pytestmark = pytest.mark.skipif(_server() is None, reason='Redis 不可用')
+
+
+def _wait(condition, timeout=5):
+    """等待后台监听线程处理失效消息"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def writer():
+    client = _server()
+    yield client
+    keys = list(client.scan_iter(match=PREFIX + '*'))
+    if keys:
+        client.delete(*keys)
+    client.close()
+
+
+@pytest.fixture
+def near_cache():
+    cache = redis_util.enable_near_cache(max_size=100, prefixes=[PREFIX])
+    yield cache
+    redis_util.disable_near_cache()
+
+
+def _key():
+    return PREFIX + uuid.uuid4().hex
+
+
+def test_read_pool_uses_redis_util_config(near_cache):
+    pool = near_cache._client.connection_pool
+    assert isinstance(pool, redis.BlockingConnectionPool)
+    assert pool.max_connections == redis_util.max_connections
+    assert pool.timeout == redis_util.pool_timeout
+    assert near_cache._client.get_retry() is not None
+
+
+def test_tracking_invalidation(near_cache, writer):
+    key = _key()
+    writer.set(key, 'v1')
+    assert near_cache.get(key) == 'v1'
+    assert near_cache.get(key) == 'v1'
+    assert near_cache.stats()['hits'] == 1
+    
+    # 其他客户端修改后，服务端推送失效消息，本地副本被删除
+    writer.set(key, 'v2')
+    assert _wait(lambda: key not in near_cache._entries)
+    assert near_cache.get(key) == 'v2'
+
+
+def test_reconnect_flushes_local_cache(near_cache, writer):
+    key = _key()
+    writer.set(key, 'v1')
+    assert near_cache.get(key) == 'v1'
+    flushes = near_cache.stats()['flushes']
+    listener_id = near_cache._listener_id
+    
+    # 断开监听连接：失效消息可能丢失，本地缓存必须清空
+    writer.client_kill_filter(_id=listener_id)
+    assert _wait(lambda: near_cache.stats()['flushes'] > flushes)
+    assert key not in near_cache._entries
+    assert _wait(lambda: near_cache._healthy.is_set() and near_cache._listener_id != listener_id)
+    
+    # 重连后读连接重定向到新的监听连接，失效消息继续生效
+    assert near_cache.get(key) == 'v1'
+    writer.set(key, 'v2')
+    assert _wait(lambda: key not in near_cache._entries)
+    assert near_cache.get(key) == 'v2'
+
+
+def test_invalidation_during_pending_read_is_not_cached(near_cache, writer, monkeypatch):
+    key = _key()
+    writer.set(key, 'v1')
+    client_get = near_cache._client.get
+    
+    def racing_get(name):
+        # 读取返回旧值后、写入本地缓存前，其他客户端修改了该键
+        value = client_get(name)
+        invalidations = near_cache.invalidations
+        writer.set(name, 'v2')
+        assert _wait(lambda: near_cache.invalidations > invalidations)
+        return value
+    
+    monkeypatch.setattr(near_cache._client, 'get', racing_get)
+    assert near_cache.get(key) == 'v1'
+    assert key not in near_cache._entries
+    
+    monkeypatch.setattr(near_cache._client, 'get', client_get)
+    assert near_cache.get(key) == 'v2'
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+查询缓存测试：SQL 表名提取和进程内 LRU 缓存
+"""
+
+import pytest
+
+from th_cnd_utils.db import query_cache
+from th_cnd_utils.db.query_cache import QueryCache, extract_read_tables, extract_write_tables
+
+
+@pytest.mark.parametrize('sql, tables', [
+    ("SELECT * FROM users WHERE id = %s", {'users'}),
+    ("SELECT * FROM orders o, users AS u WHERE o.uid = u.id", {'orders', 'users'}),
+    ("SELECT * FROM a, b AS bb, `db`.`c` c", {'a', 'b', 'c'}),
+    ("SELECT * FROM orders o JOIN users u ON o.uid = u.id LEFT JOIN items i USING (oid)",
+     {'orders', 'users', 'items'}),
+    ("SELECT * FROM t1 STRAIGHT_JOIN t2 ON t1.a = t2.a", {'t1', 't2'}),
+    ("SELECT * FROM a JOIN b USING (id), c", {'a', 'b', 'c'}),
+    ("SELECT * FROM a JOIN b ON (a.id = b.id), c", {'a', 'b', 'c'}),
+    ("SELECT * FROM t PARTITION (p0) USE INDEX (idx_a) WHERE a = 1", {'t'}),
+    # 派生表和子查询中的表
+    ("SELECT * FROM (SELECT id FROM inner_t WHERE x IN (SELECT y FROM deep)) d JOIN e USING (id), f",
+     {'inner_t', 'deep', 'e', 'f'}),
+    ("SELECT (SELECT COUNT(*) FROM logs) AS n FROM users", {'logs', 'users'}),
+    ("SELECT 1", set()),
+])
+def test_extract_read_tables(sql, tables):
+    assert extract_read_tables(sql) >= tables
+
+
+@pytest.mark.parametrize('sql, tables', [
+    ("INSERT INTO t (a) VALUES (%s)", {'t'}),
+    ("INSERT IGNORE INTO `db`.`t` VALUES (1)", {'t'}),
+    ("INSERT INTO t (a) SELECT a FROM s", {'t', 's'}),
+    ("REPLACE LOW_PRIORITY INTO r VALUES (1)", {'r'}),
+    ("UPDATE users SET name = %s WHERE id = %s", {'users'}),
+    ("UPDATE LOW_PRIORITY a, b SET a.x = b.x WHERE a.id = b.id", {'a', 'b'}),
+    ("UPDATE a JOIN b ON a.id = b.id SET a.x = b.x", {'a', 'b'}),
+    ("DELETE QUICK FROM t WHERE id = 1", {'t'}),
+    ("DELETE t1, t2 FROM t1 JOIN t2 ON t1.id = t2.id", {'t1', 't2'}),
+    ("DELETE FROM t WHERE id IN (SELECT id FROM s)", {'t', 's'}),
+    ("TRUNCATE TABLE t", {'t'}),
+    ("ALTER TABLE t ADD COLUMN c INT", {'t'}),
+    ("DROP TABLE IF EXISTS a, b", {'a', 'b'}),
+    ("RENAME TABLE a TO b, c TO d", {'a', 'b', 'c', 'd'}),
+    ("  update Users set a = 1;  ", {'users'}),
+])
+def test_extract_write_tables(sql, tables):
+    assert extract_write_tables(sql) >= tables
+
+
+@pytest.mark.parametrize('sql', [
+    "CALL refresh_all()",
+    "UPDATE t SET a = 1; DELETE FROM u",
+    "SET @x = 1",
+    "WITH x AS (SELECT 1) UPDATE t SET a = 1",
+    "LOAD DATA INFILE 'f' INTO TABLE t",
+    "",
+])
+def test_unrecognised_write_invalidates_everything(sql):
+    assert extract_write_tables(sql) is None
+
+
+def test_make_key_keeps_whitespace_in_literals():
+    assert QueryCache.make_key("SELECT * FROM t WHERE n = 'a  b'") != QueryCache.make_key(
+        "SELECT * FROM t WHERE n = 'a b'")
+    assert QueryCache.make_key(" SELECT 1\n") == QueryCache.make_key("SELECT 1")
+    assert QueryCache.make_key("SELECT %s", (1,)) != QueryCache.make_key("SELECT %s", (2,))
+
+
+def _fill(cache, sql, value, ttl=60):
+    found, _, slot = cache.get(sql)
+    assert not found
+    cache.set(slot, value, ttl)
+
+
+def test_local_hit_and_invalidation():
+    cache = QueryCache()
+    _fill(cache, "SELECT * FROM users u JOIN orders o ON u.id = o.uid", [1])
+    _fill(cache, "SELECT * FROM items", [2])
+    assert cache.get("SELECT * FROM users u JOIN orders o ON u.id = o.uid")[:2] == (True, [1])
+    
+    cache.invalidate_sql("UPDATE orders SET paid = 1")
+    assert not cache.get("SELECT * FROM users u JOIN orders o ON u.id = o.uid")[0]
+    assert cache.get("SELECT * FROM items")[:2] == (True, [2])
+    
+    cache.invalidate_sql("CALL refresh_all()")
+    assert not cache.get("SELECT * FROM items")[0]
+    assert cache.stats()['size'] == 0
+
+
+def test_local_lru_eviction():
+    cache = QueryCache(max_size=2)
+    _fill(cache, "SELECT * FROM a", 'a')
+    _fill(cache, "SELECT * FROM b", 'b')
+    assert cache.get("SELECT * FROM a")[0]
+    _fill(cache, "SELECT * FROM c", 'c')
+    # b 最久未使用，被淘汰
+    assert not cache.get("SELECT * FROM b")[0]
+    assert cache.get("SELECT * FROM a")[0]
+    assert cache.get("SELECT * FROM c")[0]
+    assert set(cache._tags) == {'a', 'c'}
+
+
+def test_local_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(query_cache.time, 'monotonic', lambda: now[0])
+    cache = QueryCache()
+    _fill(cache, "SELECT * FROM a", 'a', ttl=10)
+    now[0] += 9
+    assert cache.get("SELECT * FROM a")[0]
+    now[0] += 2
+    assert not cache.get("SELECT * FROM a")[0]
+    assert not cache._tags
+
+
+def test_result_is_dropped_when_invalidated_during_query():
+    cache = QueryCache()
+    found, _, slot = cache.get("SELECT * FROM a")
+    # 查询执行期间其他线程写入了任意表，结果可能已过时
+    cache.invalidate_tables(['other'])
+    cache.set(slot, 'stale', 60)
+    assert not cache.get("SELECT * FROM a")[0]
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+RabbitMQ 发布确认测试
+使用模拟的连接和通道驱动确认回调，不需要 RabbitMQ 服务
+"""
+
+import pika
+import pytest
+
+from th_cnd_utils import rabbitmq_util
+
+
+class FakeChannel:
+    def __init__(self, connection):
+        self.connection = connection
+        self.is_closed = False
+        self.published = []
+        self._impl = self
+    
+    def confirm_delivery(self, ack_nack_callback, callback):
+        if self.connection.select_ok:
+            self.connection.events.append(lambda: callback(pika.frame.Method(1, pika.spec.Confirm.SelectOk())))
+    
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.published.append(body)
+    
+    def close(self):
+        self.is_closed = True
+
+
+class FakeConnection:
+    """process_data_events 依次执行 events 中的回调，模拟服务端返回的帧"""
+    
+    def __init__(self, select_ok=True):
+        self.select_ok = select_ok
+        self.is_closed = False
+        self.events = []
+        self.channels = []
+    
+    def channel(self):
+        channel = FakeChannel(self)
+        self.channels.append(channel)
+        return channel
+    
+    def process_data_events(self, time_limit=0):
+        events, self.events = self.events, []
+        for event in events:
+            event()
+    
+    def call_later(self, delay, callback):
+        pass
+
+
+def _ack(tag, multiple=False):
+    return pika.frame.Method(1, pika.spec.Basic.Ack(delivery_tag=tag, multiple=multiple))
+
+
+def _nack(tag, multiple=False):
+    return pika.frame.Method(1, pika.spec.Basic.Nack(delivery_tag=tag, multiple=multiple))
+
+
+@pytest.fixture
+def connection(monkeypatch):
+    connection = FakeConnection()
+    monkeypatch.setattr(rabbitmq_util, '_connection', connection)
+    monkeypatch.setattr(rabbitmq_util, '_channel', None)
+    monkeypatch.setattr(rabbitmq_util, '_confirm_channel', None)
+    monkeypatch.setattr(rabbitmq_util, '_pending_confirms', None)
+    monkeypatch.setattr(rabbitmq_util, '_confirm_seq', 0)
+    monkeypatch.setattr(rabbitmq_util, 'confirm_window', 2)
+    monkeypatch.setattr(rabbitmq_util, 'confirm_timeout', 0.2)
+    return connection
+
+
+def _publish(count):
+    return [rabbitmq_util._publish_confirmed('q', f'm{i}'.encode(), None) for i in range(count)]
+
+
+def test_window_waits_for_confirms(connection):
+    first, second = _publish(2)
+    # 窗口已满，第三条消息要等到第一条确认后才发送
+    connection.events.append(lambda: rabbitmq_util._on_confirm(_ack(1)))
+    third, = _publish(1)
+    assert first.result(0) is True
+    assert not second.done() and not third.done()
+    assert list(rabbitmq_util._pending_confirms) == [2, 3]
+    assert rabbitmq_util._confirm_channel.published == [b'm0', b'm1', b'm0']
+
+
+def test_window_timeout(connection):
+    _publish(2)
+    with pytest.raises(TimeoutError):
+        _publish(1)
+    assert len(rabbitmq_util._confirm_channel.published) == 2
+
+
+def test_multiple_ack(connection):
+    futures = _publish(2)
+    connection.events.append(lambda: rabbitmq_util._on_confirm(_ack(2, multiple=True)))
+    futures += _publish(1)
+    assert [future.result(0) for future in futures[:2]] == [True, True]
+    assert not futures[2].done()
+    assert not rabbitmq_util.wait_for_confirms(timeout=0.05)
+    
+    connection.events.append(lambda: rabbitmq_util._on_confirm(_ack(3)))
+    assert rabbitmq_util.wait_for_confirms(timeout=1)
+    assert futures[2].result(0) is True
+
+
+def test_nack(connection, monkeypatch):
+    monkeypatch.setattr(rabbitmq_util, 'confirm_window', 10)
+    futures = _publish(4)
+    rabbitmq_util._on_confirm(_nack(1))
+    rabbitmq_util._on_confirm(_ack(2))
+    rabbitmq_util._on_confirm(_nack(4, multiple=True))
+    assert isinstance(futures[0].exception(0), Exception)
+    assert futures[1].result(0) is True
+    assert all(future.exception(0) is not None for future in futures[2:])
+    assert rabbitmq_util.wait_for_confirms(timeout=0)
+
+
+def test_open_confirm_channel_timeout(connection):
+    connection.select_ok = False
+    with pytest.raises(TimeoutError):
+        rabbitmq_util._open_confirm_channel()
+    assert connection.channels[-1].is_closed
+    assert rabbitmq_util._confirm_channel is None
+
+
+def test_open_confirm_channel_closed(connection):
+    connection.select_ok = False
+    connection.events.append(lambda: connection.channels[-1].close())
+    with pytest.raises(Exception, match='通道已关闭'):
+        rabbitmq_util._open_confirm_channel()
+    assert rabbitmq_util._confirm_channel is None
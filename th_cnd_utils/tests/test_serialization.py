@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+序列化测试：pack/unpack 的编码、压缩阈值和首字节标记
+"""
+
+import random
+
+import pytest
+
+from th_cnd_utils import serialization
+from th_cnd_utils.serialization import pack, unpack, COMPRESSORS
+
+VALUE = {'id': 1, 'name': '测试', 'tags': ['a', 'b'], 'score': 1.5, 'empty': None}
+# 重复内容，压缩后明显变小
+LARGE_VALUE = {'rows': [{'id': index, 'status': 'active'} for index in range(200)]}
+
+# 未安装时跳过的可选依赖
+_OPTIONAL = {
+    'msgpack': 'msgpack',
+    'lz4': 'lz4_frame',
+    'zstd': 'zstandard'
+}
+
+
+def _require(name):
+    if name in _OPTIONAL and getattr(serialization, _OPTIONAL[name]) is None:
+        pytest.skip(f"未安装 {name}")
+
+
+@pytest.mark.parametrize('codec', ['json', 'msgpack', 'pickle'])
+@pytest.mark.parametrize('value', [VALUE, LARGE_VALUE])
+def test_round_trip_uncompressed(codec, value):
+    _require(codec)
+    data = pack(value, codec)
+    assert data[0] == 0
+    assert unpack(data, codec) == value
+
+
+@pytest.mark.parametrize('codec', ['json', 'msgpack', 'pickle'])
+@pytest.mark.parametrize('compression', list(COMPRESSORS))
+def test_round_trip_compressed_above_threshold(codec, compression):
+    _require(codec)
+    _require(compression)
+    data = pack(LARGE_VALUE, codec, compression, threshold=64)
+    assert data[0] == COMPRESSORS[compression][0]
+    assert len(data) < len(serialization.serialize(LARGE_VALUE, codec))
+    assert unpack(data, codec) == LARGE_VALUE
+
+
+@pytest.mark.parametrize('compression', list(COMPRESSORS))
+def test_below_threshold_not_compressed(compression):
+    # 未达到阈值时不调用压缩函数，不需要安装可选依赖
+    data = pack(VALUE, 'json', compression, threshold=1024)
+    assert data == b'\x00' + serialization.serialize(VALUE, 'json')
+    assert unpack(data, 'json') == VALUE
+
+
+def test_compression_without_gain_stored_uncompressed():
+    # 随机字节无法压缩，压缩结果不小于原始数据时保留原始数据
+    value = random.Random(0).randbytes(512)
+    plain = serialization.serialize(value, 'pickle')
+    assert len(serialization.compress(plain, 'zlib')) >= len(plain)
+    data = pack(value, 'pickle', 'zlib', threshold=1)
+    assert data == b'\x00' + plain
+    assert unpack(data, 'pickle') == value
+
+
+def test_raw_is_unframed():
+    assert pack(b'\x01\x02', 'raw', 'zlib', threshold=1) == b'\x01\x02'
+    assert pack('文本', 'raw') == '文本'.encode('utf-8')
+    assert unpack(b'\x01\x02', 'raw') == b'\x01\x02'
+    assert unpack(bytearray(b'\x00abc'), 'raw') == b'\x00abc'
+
+
+def test_raw_rejects_other_types():
+    with pytest.raises(TypeError):
+        pack({'a': 1}, 'raw')
+
+
+def test_unpack_none():
+    assert unpack(None, 'json') is None
+
+
+def test_unknown_flag_raises():
+    with pytest.raises(ValueError):
+        unpack(b'\x7f{}', 'json')
+
+
+def test_unknown_codec_and_compression_raise():
+    with pytest.raises(ValueError):
+        pack(VALUE, 'yaml')
+    with pytest.raises(ValueError):
+        pack(LARGE_VALUE, 'json', 'brotli', threshold=1)
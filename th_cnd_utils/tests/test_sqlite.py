@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SQLite 工具类测试：使用临时数据库文件
+"""
+
+import pytest
+
+from th_cnd_utils import sqlite_util
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(sqlite_util, 'db_path', str(tmp_path / 'test.sqlite'))
+    monkeypatch.setattr(sqlite_util, '_connection', None)
+    sqlite_util.execute_update("CREATE TABLE items (name TEXT, status TEXT)")
+    for index in range(5):
+        sqlite_util.execute_update("INSERT INTO items (name, status) VALUES (?, ?)",
+                                   (f"item{index}", 'new' if index % 2 else 'old'))
+    yield sqlite_util
+    sqlite_util._connection.close()
+
+
+def test_scan_table_by_rowid(db):
+    pages = list(db.scan_table('items', 'rowid', batch_size=2))
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [row['name'] for page in pages for row in page] == [f"item{index}" for index in range(5)]
+    assert [row['rowid'] for row in pages[-1]] == [5]
+
+
+def test_scan_table_columns_without_key(db):
+    pages = list(db.scan_table('items', 'rowid', batch_size=2, columns='name'))
+    assert pages[0] == [{'rowid': 1, 'name': 'item0'}, {'rowid': 2, 'name': 'item1'}]
+
+
+def test_scan_table_positional_params(db):
+    pages = list(db.scan_table('items', 'rowid', batch_size=1, where='status = ?', params=['new']))
+    assert [row['name'] for page in pages for row in page] == ['item1', 'item3']
+
+
+def test_scan_table_named_params(db):
+    pages = list(db.scan_table('items', 'rowid', batch_size=1, where='status = :status',
+                               params={'status': 'old'}, start_after=1))
+    assert [row['name'] for page in pages for row in page] == ['item2', 'item4']